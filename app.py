@@ -1,5 +1,6 @@
 import os
 import io
+import time
 from typing import Optional, Tuple
 
 import streamlit as st
@@ -7,17 +8,92 @@ from PIL import Image
 import numpy as np
 
 from utils.preprocess import preprocess_roi
-from utils.ocr import extract_text
-from utils.validation import validate_text, ValidationResult
+from utils.ocr import extract_text, extract_text_batch, best_text, warm_up_easyocr
+from utils.validation import validate_text, reload_env, ValidationResult
+from utils.gemini_client import clear_negative_cache as clear_gemini_failures
+from utils.deepseek_client import clear_negative_cache as clear_deepseek_failures
 
 
 st.set_page_config(page_title="IC Marking OCR & Validation", layout="wide")
+# Pre-load the EasyOCR model while the user is still uploading/cropping (no-op after first run)
+warm_up_easyocr()
 
-def load_image(upload) -> Optional[Image.Image]:
+# Env vars that change which validator runs (and with which credentials/model).
+_PROVIDER_ENV = ("GEMINI_API_KEY", "GEMINI_MODEL", "DEEPSEEK_API_KEY", "DEEPSEEK_MODEL", "SERPAPI_KEY")
+
+
+def load_image(upload) -> Optional[np.ndarray]:
+    """Decode the upload straight to an RGB NumPy array with OpenCV (no PIL decode/copy)."""
+    import cv2 as cv  # lazy import, as in utils.preprocess
     try:
-        return Image.open(upload).convert("RGB")
+        data = np.frombuffer(upload.getvalue(), dtype=np.uint8)
+        bgr = cv.imdecode(data, cv.IMREAD_COLOR)
     except Exception:
         return None
+    if bgr is None:
+        return None
+    return cv.cvtColor(bgr, cv.COLOR_BGR2RGB)
+
+
+def _clear_on_edit(name: str, value: str, clear) -> None:
+    """Call `clear` when a sidebar field changed since the previous rerun."""
+    state_key = f"_prev_{name}"
+    prev = st.session_state.get(state_key)
+    if prev is not None and prev != value:
+        clear()
+    st.session_state[state_key] = value
+
+
+@st.cache_data(show_spinner=False)
+def cached_preprocess(roi_bytes: bytes, shape: Tuple[int, ...], contrast: bool, binarize: bool,
+                      denoise: bool) -> Image.Image:
+    """Preprocess a raw RGB ROI; reruns with the same crop and options hit the cache."""
+    roi = np.frombuffer(roi_bytes, dtype=np.uint8).reshape(shape)
+    return preprocess_roi(roi, contrast=contrast, binarize=binarize, denoise=denoise)
+
+
+@st.cache_data(show_spinner=False)
+def cached_extract(roi_bytes: bytes, shape: Tuple[int, ...], contrast: bool, binarize: bool, denoise: bool,
+                   engine: str, tess_cmd: str) -> str:
+    """OCR keyed by ROI bytes, preprocessing flags and engine; returns an immutable str."""
+    pre_img = cached_preprocess(roi_bytes, shape, contrast, binarize, denoise)
+    return extract_text(pre_img, engine=engine)
+
+
+@st.cache_data(show_spinner=False)
+def cached_extract_best(roi_bytes: bytes, shape: Tuple[int, ...], variants: Tuple[Tuple[bool, bool, bool], ...],
+                        engine: str, tess_cmd: str) -> Tuple[str, int]:
+    """OCR every (contrast, binarize, denoise) variant in one batch; returns (best text, variant index)."""
+    imgs = [cached_preprocess(roi_bytes, shape, *flags) for flags in variants]
+    texts = extract_text_batch(imgs, engine=engine)
+    idx = best_text(texts)
+    return texts[idx], idx
+
+
+VALIDATION_TTL_S = 3600
+# WARNING results (errors, timeouts, uncertain verdicts) are only reused briefly
+VALIDATION_WARNING_TTL_S = 60
+_VALIDATION_CACHE_SIZE = 32
+
+
+def cached_validate(text: str, webhook_url: str, mode: str, provider_config: Tuple[str, ...],
+                    on_status=None) -> ValidationResult:
+    """Validation keyed by OCR text, webhook, mode and the configured provider env.
+    provider_config is only part of the cache key so key/model edits force a fresh run.
+    Kept in st.session_state rather than st.cache_data: on a miss the preliminary status is
+    streamed into the page via `on_status`, which a cached function cannot write/replay.
+    """
+    cache = st.session_state.setdefault("_validation_cache", {})
+    key = (text, webhook_url, mode, provider_config)
+    hit = cache.get(key)
+    if hit and time.time() < hit[0]:
+        return hit[1]
+    result = validate_text(text, webhook_url=webhook_url, mode=mode, on_status=on_status)
+    ttl = VALIDATION_TTL_S if result.status in ("PASS", "FAIL") else VALIDATION_WARNING_TTL_S
+    cache[key] = (time.time() + ttl, result)
+    while len(cache) > _VALIDATION_CACHE_SIZE:
+        cache.pop(next(iter(cache)))
+    return result
 
 
 def main():
@@ -45,16 +121,22 @@ def main():
             os.environ["TESSERACT_CMD"] = tess_cmd
         apply_contrast = st.checkbox("Increase contrast (CLAHE)", value=True)
         apply_binarize = st.checkbox("Binarize (adaptive threshold)", value=True)
-        apply_denoise = st.checkbox("Denoise (median blur)", value=True)
+        apply_denoise = st.checkbox("Denoise (median blur)", value=True,
+                                    help="Only applied when Binarize is off; the threshold already removes speckle.")
+        try_variants = st.checkbox("Also try alternate preprocessing (batched OCR)", value=False,
+                                   help="OCR the ROI with CLAHE and Binarize toggled too, and keep the richest text.")
         n8n_url = st.text_input("n8n webhook URL (optional)", value=os.getenv("N8N_WEBHOOK_URL", ""))
-        st.caption("When Gemini key is set, validation uses Gemini only (no web search).")
+        st.caption("With a Gemini key, Gemini races DeepSeek or SerpAPI when those keys are set too, otherwise it validates alone.")
         gemini_key = st.text_input("Gemini API Key", value=os.getenv("GEMINI_API_KEY", ""))
         if gemini_key:
             os.environ["GEMINI_API_KEY"] = gemini_key
+        # A fixed/re-entered key should be retried right away, not after the failure cache expires
+        _clear_on_edit("gemini_key", gemini_key, clear_gemini_failures)
         gemini_model = st.text_input("Gemini Model (optional)", value=os.getenv("GEMINI_MODEL", ""),
                                      help="Use names like gemini-1.5-flash or gemini-1.5-pro (no 'models/' prefix).")
         if gemini_model:
             os.environ["GEMINI_MODEL"] = gemini_model
+        _clear_on_edit("gemini_model", gemini_model, clear_gemini_failures)
         st.caption("If Gemini key is missing, DeepSeek/SerpAPI may be used as fallback.")
         serpapi_key = st.text_input("SerpAPI API Key", value=os.getenv("SERPAPI_KEY", ""))
         if serpapi_key:
@@ -62,18 +144,22 @@ def main():
         deepseek_key = st.text_input("DeepSeek API Key", value=os.getenv("DEEPSEEK_API_KEY", ""))
         if deepseek_key:
             os.environ["DEEPSEEK_API_KEY"] = deepseek_key
+        _clear_on_edit("deepseek_key", deepseek_key, clear_deepseek_failures)
         deepseek_model = st.text_input("DeepSeek Model (optional)", value=os.getenv("DEEPSEEK_MODEL", ""),
                                       help="If 404 occurs, try deepseek-chat or deepseek-reasoner.")
         if deepseek_model:
             os.environ["DEEPSEEK_MODEL"] = deepseek_model
+        _clear_on_edit("deepseek_model", deepseek_model, clear_deepseek_failures)
+        # Validation reads provider keys once; pick up the sidebar values
+        reload_env()
 
     uploaded = st.file_uploader("Upload IC image", type=["png", "jpg", "jpeg", "bmp", "tiff"]) 
     if uploaded is None:
         st.info("Upload an image to get started.")
         return
 
-    image = load_image(uploaded)
-    if image is None:
+    image_rgb = load_image(uploaded)
+    if image_rgb is None:
         st.error("Could not read the uploaded image.")
         return
 
@@ -83,10 +169,10 @@ def main():
     cropped_img = None
     try:
         from streamlit_cropper import st_cropper  # lazy import to avoid module-level crashes
-        cropped_img = st_cropper(image, realtime_update=True, box_color=(0, 255, 0), aspect_ratio=None)
+        cropped_img = st_cropper(Image.fromarray(image_rgb), realtime_update=True, box_color=(0, 255, 0), aspect_ratio=None)
     except Exception as e:
         st.warning(f"Interactive cropper unavailable, using manual crop sliders. ({e.__class__.__name__})")
-        w, h = image.size
+        h, w = image_rgb.shape[:2]
         colA, colB = st.columns(2)
         with colA:
             x = st.slider("Left (x)", 0, max(0, w - 10), 0)
@@ -94,10 +180,8 @@ def main():
         with colB:
             cw = st.slider("Width", 10, w - x, min(200, w - x))
             ch = st.slider("Height", 10, h - y, min(100, h - y))
-        try:
-            cropped_img = image.crop((x, y, x + cw, y + ch))
-        except Exception:
-            cropped_img = image
+        # Slice the decoded array directly (a view, no copy)
+        cropped_img = image_rgb[y:y + ch, x:x + cw]
 
     if cropped_img is None:
         st.warning("No ROI selected yet.")
@@ -105,18 +189,33 @@ def main():
 
     col1, col2, col3 = st.columns(3)
     with col1:
-        st.image(image, caption="Original", use_column_width=True)
+        st.image(image_rgb, caption="Original", use_column_width=True)
     with col2:
         st.image(cropped_img, caption="Cropped ROI", use_column_width=True)
 
-    # Preprocess
-    pre_img = preprocess_roi(cropped_img, contrast=apply_contrast, binarize=apply_binarize, denoise=apply_denoise)
+    # Preprocess (cached on the raw ROI bytes so unrelated widget changes skip the work)
+    if isinstance(cropped_img, Image.Image):
+        cropped_img = np.asarray(cropped_img.convert("RGB"))
+    roi = np.ascontiguousarray(cropped_img)
+    roi_bytes, roi_shape = roi.tobytes(), roi.shape
+    pre_img = cached_preprocess(roi_bytes, roi_shape, apply_contrast, apply_binarize, apply_denoise)
     with col3:
         st.image(pre_img, caption="Preprocessed ROI", use_column_width=True)
 
     # OCR
     with st.spinner("Running OCR..."):
-        text = extract_text(pre_img, engine=ocr_engine)
+        if try_variants:
+            selected = (apply_contrast, apply_binarize, apply_denoise)
+            variants = (selected,
+                        (apply_contrast, not apply_binarize, apply_denoise),
+                        (not apply_contrast, apply_binarize, apply_denoise))
+            text, best_idx = cached_extract_best(roi_bytes, roi_shape, variants, ocr_engine, tess_cmd or "")
+            if best_idx > 0:
+                contrast_v, binarize_v, _ = variants[best_idx]
+                st.caption(f"Best OCR came from an alternate variant (CLAHE={contrast_v}, Binarize={binarize_v}).")
+        else:
+            text = cached_extract(roi_bytes, roi_shape, apply_contrast, apply_binarize, apply_denoise,
+                                  ocr_engine, tess_cmd or "")
 
     st.subheader("Detected Text")
     if text.strip():
@@ -124,9 +223,20 @@ def main():
     else:
         st.warning("No text detected. Try adjusting crop or preprocessing options.")
 
-    # Validation
-    with st.spinner("Validating marking..."):
-        result: ValidationResult = validate_text(text, webhook_url=n8n_url, mode="serpapi")
+    # Validation (skipped when OCR produced nothing usable; no search/LLM call can succeed)
+    if len(text.strip()) < 3:
+        result = ValidationResult(status="WARNING", details="No OCR text", reference=None)
+    else:
+        early_status = st.empty()
+
+        def show_early_status(status: str) -> None:
+            early_status.info(f"Preliminary status: {status} (LLM still explaining...)")
+
+        with st.spinner("Validating marking..."):
+            provider_config = tuple(os.getenv(k, "") for k in _PROVIDER_ENV)
+            result: ValidationResult = cached_validate(text, n8n_url or "", "serpapi", provider_config,
+                                                       on_status=show_early_status)
+        early_status.empty()
 
     st.subheader("Validation Result")
     status_color = {"PASS": "#2ecc71", "FAIL": "#e74c3c", "WARNING": "#f1c40f"}.get(result.status, "#3498db")
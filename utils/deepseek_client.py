@@ -1,6 +1,11 @@
 import os
-import json
-import requests
+import re
+import time
+import asyncio
+import hashlib
+import httpx
+import orjson
+from utils.http import get_session, pooled_client
 
 
 # Prefer v1 endpoint; also support legacy path via automatic fallback
@@ -8,112 +13,333 @@ DEFAULT_API_URLS = [
     os.getenv("DEEPSEEK_API_URL") or "https://api.deepseek.com/v1/chat/completions",
     "https://api.deepseek.com/chat/completions",
 ]
+# Seconds to wait for an endpoint's response headers before hedging the same request to the
+# next one; once an endpoint has started answering, its (streamed) generation is never hedged
+HEDGE_DELAY_S = 2.0
+CACHE_TTL_SECONDS = 3600
+# WARNING is often a transient "couldn't tell"; keep it only briefly so a retry can do better
+WARNING_CACHE_TTL_SECONDS = 60
+NEG_CACHE_TTL_SECONDS = 60
+_NEG_CACHE: dict[str, tuple[float, dict]] = {}
+# Prompt budget: OCR text is truncated and the reply is a one-line JSON verdict
+MAX_OCR_CHARS = 2000
+MAX_OUTPUT_TOKENS = 128
+SYSTEM_PROMPT = (
+    "IC authenticity auditor. Input JSON: ocr = OCR text of an IC marking; ctx = web results as "
+    "'title url :: snippet'. Reply with JSON only: {\"status\": \"PASS|FAIL|WARNING\", \"reason\": one short sentence}. "
+    "PASS = genuine, FAIL = counterfeit/clone, WARNING = uncertain."
+)
+_CACHE: dict[str, tuple[float, dict]] = {}
+# Keyword fallback for replies that aren't valid JSON (single scan each)
+_PASS = re.compile(r"\b(pass|real|genuine)\b", re.IGNORECASE)
+_FAIL = re.compile(r"\b(fail|fake|counterfeit)\b", re.IGNORECASE)
 
 
-def classify_genuineness(ocr_text: str, organic_results: list | None = None) -> dict:
-    """Call DeepSeek API to classify IC genuineness using OCR text and optional search results.
-    Returns a dict: {"status": "PASS|FAIL|WARNING", "reason": "..."} or {"error": "..."}.
-    """
-    api_key = os.getenv("DEEPSEEK_API_KEY")
-    if not api_key:
-        return {"error": "DEEPSEEK_API_KEY missing"}
-
+def _build_payload(ocr_text: str, organic_results: list | None = None) -> dict:
+    # Compact context: one "title url :: snippet" line per result, truncated fields
     context_lines = []
     if isinstance(organic_results, list):
         for item in organic_results[:5]:
             title = item.get("title") or ""
             link = item.get("link") or item.get("url") or ""
             snippet = item.get("snippet") or ""
-            context_lines.append(f"- {title} | {link}\n{snippet}")
-    context_block = "\n".join(context_lines) if context_lines else "(no web context available)"
-
-    system_prompt = (
-        "You are an expert IC authenticity auditor. Classify OCR-marked ICs as REAL (genuine), "
-        "FAKE (counterfeit/clone), or UNCERTAIN. Use provided web search snippets when available."
-    )
-    user_prompt = (
-        "OCR text:\n" + ocr_text.strip() + "\n\n" +
-        "Web search context (top results):\n" + context_block + "\n\n" +
-        "Return a compact JSON with keys: status in [PASS, FAIL, WARNING] and reason (one short sentence)."
-    )
+            context_lines.append(f"{title[:80]} {link} :: {snippet[:160]}")
+    user_prompt = orjson.dumps({"ocr": ocr_text.strip()[:MAX_OCR_CHARS], "ctx": context_lines}).decode("utf-8")
 
     # Allow overriding model via env var; default to a reasoning-capable model
     model = os.getenv("DEEPSEEK_MODEL") or "deepseek-reasoner"
-    payload = {
-        "model": model,
+    return _with_model({
         "messages": [
-            {"role": "system", "content": system_prompt},
+            {"role": "system", "content": SYSTEM_PROMPT},
             {"role": "user", "content": user_prompt},
         ],
         "temperature": 0.2,
-    }
+    }, model)
+
+
+def _with_model(payload: dict, model: str) -> dict:
+    payload = dict(payload, model=model)
+    # The reasoner's chain-of-thought counts against max_tokens; a tight cap can leave no answer
+    if "reasoner" in model:
+        payload.pop("max_tokens", None)
+    else:
+        payload["max_tokens"] = MAX_OUTPUT_TOKENS
+    return payload
+
+
+def _alt_payload(payload: dict) -> dict:
+    model = payload["model"]
+    return _with_model(payload, "deepseek-chat" if model != "deepseek-chat" else "deepseek-reasoner")
+
+
+def _error_from_status(status_code: int, body: str) -> dict:
+    hint = ""
+    if status_code == 401:
+        hint = "Unauthorized: check DEEPSEEK_API_KEY"
+    elif status_code == 402:
+        hint = "Payment required: check credits/billing status"
+    elif status_code == 429:
+        hint = "Rate limited: slow down requests or check quota"
+    elif status_code == 404:
+        hint = "Not found: verify API endpoint/model (try deepseek-reasoner or deepseek-chat)"
+    return {"error": f"HTTP {status_code} {hint}".strip(), "text": body}
+
+
+def _parse_verdict(content: str) -> dict:
+    # Parse JSON block; fallback to keyword heuristic
+    try:
+        parsed = orjson.loads(content)
+        status = str(parsed.get("status", "WARNING")).upper()
+        reason = parsed.get("reason") or "No reason provided."
+        if status not in {"PASS", "FAIL", "WARNING"}:
+            status = "WARNING"
+        return {"status": status, "reason": reason}
+    except Exception:
+        status = "WARNING"
+        if _PASS.search(content):
+            status = "PASS"
+        elif _FAIL.search(content):
+            status = "FAIL"
+        return {"status": status, "reason": content.strip()[:300]}
+
+
+def _parse_content(data: dict) -> dict:
+    content = (data.get("choices") or [{}])[0].get("message", {}).get("content", "")
+    return _parse_verdict(content)
+
+
+def _cache_key(ocr_text: str, organic_results: list | None) -> str:
+    # Normalize case/whitespace so OCR reruns of the same marking share a verdict;
+    # the search context links are part of the key since they shape the answer.
+    norm = " ".join(ocr_text.upper().split())
+    links = ""
+    if isinstance(organic_results, list):
+        links = "|".join((item.get("link") or item.get("url") or "") for item in organic_results[:5])
+    model = os.getenv("DEEPSEEK_MODEL") or "deepseek-reasoner"
+    return hashlib.sha1(f"{model}|{norm}|{links}".encode("utf-8")).hexdigest()
+
+
+def _cache_get(key: str) -> dict | None:
+    hit = _CACHE.get(key)
+    if hit and time.time() < hit[0]:
+        return dict(hit[1])
+    return None
+
+
+def _cache_put(key: str, res: dict) -> None:
+    # Only verdicts are cached; errors should be retried
+    if not res.get("error"):
+        ttl = WARNING_CACHE_TTL_SECONDS if str(res.get("status", "")).upper() == "WARNING" else CACHE_TTL_SECONDS
+        _CACHE[key] = (time.time() + ttl, dict(res))
+
+
+def _neg_key() -> str | None:
+    api_key = os.getenv("DEEPSEEK_API_KEY")
+    if not api_key:
+        return None
+    # The model is part of the key: a 404 can be fixed by changing DEEPSEEK_MODEL
+    model = os.getenv("DEEPSEEK_MODEL") or "deepseek-reasoner"
+    return "deepseek:" + hashlib.sha1(f"{api_key}|{model}".encode("utf-8")).hexdigest()[:8]
+
+
+def _is_key_error(res: dict) -> bool:
+    err = res.get("error") or ""
+    return err.startswith(("HTTP 401", "HTTP 402", "HTTP 404")) or "API key not valid" in err
+
+
+def _neg_get() -> dict | None:
+    # Recent auth/billing/not-found failure for this key: fail fast instead of re-waiting on the API
+    key = _neg_key()
+    hit = _NEG_CACHE.get(key) if key else None
+    if hit and (time.time() - hit[0]) < NEG_CACHE_TTL_SECONDS:
+        return dict(hit[1])
+    return None
+
+
+def _neg_put(res: dict) -> None:
+    key = _neg_key()
+    if key and _is_key_error(res):
+        _NEG_CACHE[key] = (time.time(), dict(res))
+
+
+def clear_negative_cache() -> None:
+    """Forget cached key failures (e.g. after the user edits the API key)."""
+    _NEG_CACHE.clear()
 
+
+def _classify(ocr_text: str, organic_results: list | None = None) -> dict:
+    api_key = os.getenv("DEEPSEEK_API_KEY")
+    if not api_key:
+        return {"error": "DEEPSEEK_API_KEY missing"}
+
+    payload = _build_payload(ocr_text, organic_results)
     headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
     try:
         last_error = None
         # Try each API URL; within each, try the selected model then an alternate if 404
         for base_url in DEFAULT_API_URLS:
-            resp = requests.post(base_url, headers=headers, data=json.dumps(payload), timeout=25)
+            resp = get_session().post(base_url, headers=headers, data=orjson.dumps(payload), timeout=25)
             if resp.status_code == 404:
-                alt_model = "deepseek-chat" if model != "deepseek-chat" else "deepseek-reasoner"
-                payload_alt = dict(payload)
-                payload_alt["model"] = alt_model
-                resp_alt = requests.post(base_url, headers=headers, data=json.dumps(payload_alt), timeout=25)
+                resp_alt = get_session().post(base_url, headers=headers, data=orjson.dumps(_alt_payload(payload)), timeout=25)
                 if resp_alt.ok:
-                    data = resp_alt.json()
-                    content = (data.get("choices") or [{}])[0].get("message", {}).get("content", "")
-                    try:
-                        parsed = json.loads(content)
-                        status = str(parsed.get("status", "WARNING")).upper()
-                        reason = parsed.get("reason") or "No reason provided."
-                        if status not in {"PASS", "FAIL", "WARNING"}:
-                            status = "WARNING"
-                        return {"status": status, "reason": reason}
-                    except Exception:
-                        low = content.lower()
-                        status = "WARNING"
-                        if "pass" in low or "real" in low or "genuine" in low:
-                            status = "PASS"
-                        elif "fail" in low or "fake" in low or "counterfeit" in low:
-                            status = "FAIL"
-                        return {"status": status, "reason": content.strip()[:300]}
-                else:
-                    hint = "Not found: verify API endpoint/model (try deepseek-reasoner or deepseek-chat)"
-                    last_error = {"error": f"HTTP 404 {hint}", "text": resp_alt.text}
-                    continue
+                    return _parse_content(orjson.loads(resp_alt.content))
+                last_error = _error_from_status(404, resp_alt.text)
+                continue
 
             if not resp.ok:
-                hint = ""
-                if resp.status_code == 401:
-                    hint = "Unauthorized: check DEEPSEEK_API_KEY"
-                elif resp.status_code == 402:
-                    hint = "Payment required: check credits/billing status"
-                elif resp.status_code == 429:
-                    hint = "Rate limited: slow down requests or check quota"
-                elif resp.status_code == 404:
-                    hint = "Not found: verify API endpoint/model (try deepseek-reasoner or deepseek-chat)"
-                last_error = {"error": f"HTTP {resp.status_code} {hint}".strip(), "text": resp.text}
+                last_error = _error_from_status(resp.status_code, resp.text)
                 continue
 
             # Success path
-            data = resp.json()
-            content = (data.get("choices") or [{}])[0].get("message", {}).get("content", "")
-            try:
-                parsed = json.loads(content)
-                status = str(parsed.get("status", "WARNING")).upper()
-                reason = parsed.get("reason") or "No reason provided."
-                if status not in {"PASS", "FAIL", "WARNING"}:
-                    status = "WARNING"
-                return {"status": status, "reason": reason}
-            except Exception:
-                low = content.lower()
-                status = "WARNING"
-                if "pass" in low or "real" in low or "genuine" in low:
-                    status = "PASS"
-                elif "fail" in low or "fake" in low or "counterfeit" in low:
-                    status = "FAIL"
-                return {"status": status, "reason": content.strip()[:300]}
+            return _parse_content(orjson.loads(resp.content))
 
         return last_error or {"error": "Unknown error"}
     except Exception as e:
-        return {"error": f"Network/Client error: {e}"}
\ No newline at end of file
+        return {"error": f"Network/Client error: {e}"}
+
+
+def _is_complete(content: str) -> bool:
+    """True once a streamed reply is a complete JSON object, i.e. nothing useful is left to read."""
+    if not content.rstrip().endswith("}"):
+        return False
+    try:
+        orjson.loads(content)
+        return True
+    except orjson.JSONDecodeError:
+        return False
+
+
+async def _stream_endpoint(client: httpx.AsyncClient, base_url: str, headers: dict, payload: dict,
+                           timeout: float = 25, started: asyncio.Event | None = None) -> dict:
+    """POST with `stream: true` and collect the SSE content deltas; the stream is closed as soon
+    as the JSON verdict is complete instead of waiting for the rest of the generation.
+    `started` is set once the response headers have arrived.
+    """
+    content = ""
+    body = orjson.dumps(dict(payload, stream=True))
+    async with client.stream("POST", base_url, headers=headers, content=body, timeout=timeout) as resp:
+        if started is not None:
+            started.set()
+        if not resp.is_success:
+            text = (await resp.aread()).decode("utf-8", errors="replace")
+            return _error_from_status(resp.status_code, text)
+        async for line in resp.aiter_lines():
+            if not line.startswith("data:"):
+                continue
+            data = line[5:].strip()
+            if data == "[DONE]":
+                break
+            delta = ((orjson.loads(data).get("choices") or [{}])[0].get("delta")) or {}
+            # deepseek-reasoner streams reasoning_content first; only the answer is parsed
+            piece = delta.get("content")
+            if piece:
+                content += piece
+                if _is_complete(content):
+                    break
+    if not content:
+        return {"error": "Empty response from DeepSeek"}
+    return _parse_verdict(content)
+
+
+async def _post_endpoint(client: httpx.AsyncClient, base_url: str, headers: dict, payload: dict,
+                         timeout: float = 25, started: asyncio.Event | None = None) -> dict:
+    """Stream from one endpoint with the selected model, then the alternate model on 404."""
+    try:
+        res = await _stream_endpoint(client, base_url, headers, payload, timeout, started)
+        if (res.get("error") or "").startswith("HTTP 404"):
+            return await _stream_endpoint(client, base_url, headers, _alt_payload(payload), timeout)
+        return res
+    except Exception as e:
+        return {"error": f"Network/Client error: {e}"}
+
+
+async def _answers_within(task: asyncio.Task, started: asyncio.Event, delay: float) -> bool:
+    """True if `task` got response headers (or finished) within `delay` seconds."""
+    waiter = asyncio.ensure_future(started.wait())
+    try:
+        await asyncio.wait({task, waiter}, timeout=delay, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        waiter.cancel()
+    return started.is_set() or task.done()
+
+
+async def _classify_async(ocr_text: str, organic_results: list | None = None, timeout: float = 25) -> dict:
+    """Hedged variant of the endpoint fallback: the next API URL is tried as soon as the
+    current one fails, or in parallel if it hasn't sent response headers within HEDGE_DELAY_S
+    (slow connect/queueing; a generation that is already streaming is not duplicated).
+    The first successful verdict wins and the remaining requests are cancelled.
+    """
+    api_key = os.getenv("DEEPSEEK_API_KEY")
+    if not api_key:
+        return {"error": "DEEPSEEK_API_KEY missing"}
+
+    payload = _build_payload(ocr_text, organic_results)
+    headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
+    last_error = None
+    pending: set[asyncio.Task] = set()
+    async with pooled_client() as client:
+        try:
+            for i, base_url in enumerate(DEFAULT_API_URLS):
+                started = asyncio.Event()
+                task = asyncio.create_task(_post_endpoint(client, base_url, headers, payload, timeout, started))
+                pending.add(task)
+                is_last = i == len(DEFAULT_API_URLS) - 1
+                if not is_last and not await _answers_within(task, started, HEDGE_DELAY_S):
+                    # No response yet: hedge with the next endpoint, keeping this one in flight
+                    continue
+                while pending:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        res = task.result()
+                        if not res.get("error"):
+                            return res
+                        last_error = res
+                # Everything in flight failed: fall through to the next endpoint
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+    return last_error or {"error": "Unknown error"}
+
+
+def classify_genuineness(ocr_text: str, organic_results: list | None = None) -> dict:
+    """Call DeepSeek API to classify IC genuineness using OCR text and optional search results.
+    Returns a dict: {"status": "PASS|FAIL|WARNING", "reason": "..."} or {"error": "..."}.
+    Verdicts are cached per normalized OCR text and search context for CACHE_TTL_SECONDS
+    (WARNING for WARNING_CACHE_TTL_SECONDS).
+    """
+    if not ocr_text.strip():
+        # Nothing to classify; skip the API round-trip
+        return {"status": "WARNING", "reason": "empty OCR"}
+    key = _cache_key(ocr_text, organic_results)
+    hit = _cache_get(key)
+    if hit is not None:
+        return hit
+    neg = _neg_get()
+    if neg is not None:
+        return neg
+    res = _classify(ocr_text, organic_results)
+    _cache_put(key, res)
+    _neg_put(res)
+    return res
+
+
+async def classify_genuineness_async(ocr_text: str, organic_results: list | None = None, timeout: float = 25) -> dict:
+    """Async variant of classify_genuineness; same endpoint/model fallbacks, result shape and cache.
+    `timeout` (seconds) applies to each API request.
+    """
+    if not ocr_text.strip():
+        # Nothing to classify; skip the API round-trip
+        return {"status": "WARNING", "reason": "empty OCR"}
+    key = _cache_key(ocr_text, organic_results)
+    hit = _cache_get(key)
+    if hit is not None:
+        return hit
+    neg = _neg_get()
+    if neg is not None:
+        return neg
+    res = await _classify_async(ocr_text, organic_results, timeout)
+    _cache_put(key, res)
+    _neg_put(res)
+    return res
@@ -0,0 +1,84 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from typing import Any, Optional
+
+
+CACHE_DIR = os.path.expanduser("~/.aoi")
+CACHE_PATH = os.path.join(CACHE_DIR, "validation_cache.sqlite3")
+DEFAULT_EXPIRE_S = 7 * 86400
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS llm_cache (
+    input_hash TEXT NOT NULL,
+    prompt_version TEXT NOT NULL,
+    provider TEXT NOT NULL,
+    response BLOB NOT NULL,
+    created_at INTEGER NOT NULL,
+    expires_at INTEGER NOT NULL,
+    PRIMARY KEY (input_hash, prompt_version, provider)
+)
+"""
+
+_lock = threading.Lock()
+_conn: Optional[sqlite3.Connection] = None
+_disabled = False
+
+
+def _connect() -> Optional[sqlite3.Connection]:
+    # Opened lazily; a read-only home or broken file just disables the disk layer
+    global _conn, _disabled
+    if _conn is None and not _disabled:
+        try:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            conn = sqlite3.connect(CACHE_PATH, check_same_thread=False, timeout=1)
+            conn.execute(_SCHEMA)
+            conn.commit()
+            _conn = conn
+        except Exception:
+            _disabled = True
+    return _conn
+
+
+def disk_get(input_hash: str, prompt_version: str, provider: str) -> Optional[Any]:
+    """Return the cached object for (input_hash, prompt_version, provider), or None if absent/expired."""
+    with _lock:
+        conn = _connect()
+        if conn is None:
+            return None
+        try:
+            row = conn.execute(
+                "SELECT response, expires_at FROM llm_cache WHERE input_hash=? AND prompt_version=? AND provider=?",
+                (input_hash, prompt_version, provider),
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] <= int(time.time()):
+                conn.execute(
+                    "DELETE FROM llm_cache WHERE input_hash=? AND prompt_version=? AND provider=?",
+                    (input_hash, prompt_version, provider),
+                )
+                conn.commit()
+                return None
+            return pickle.loads(row[0])
+        except Exception:
+            return None
+
+
+def disk_put(input_hash: str, prompt_version: str, provider: str, value: Any, expire: int = DEFAULT_EXPIRE_S) -> None:
+    """Store `value` (pickled) for `expire` seconds; failures are ignored (the cache is best-effort)."""
+    now = int(time.time())
+    with _lock:
+        conn = _connect()
+        if conn is None:
+            return
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO llm_cache VALUES (?, ?, ?, ?, ?, ?)",
+                (input_hash, prompt_version, provider, pickle.dumps(value), now, now + expire),
+            )
+            conn.commit()
+        except Exception:
+            pass
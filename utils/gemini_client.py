@@ -1,46 +1,107 @@
 import os
-import json
-import requests
+import re
+import time
+import hashlib
+import orjson
+from utils.http import get_session, pooled_client
 
 
-def _build_payload(ocr_text: str) -> dict:
-    system_instruction = (
-        "You are an expert IC authenticity auditor. Given ONLY the OCR text from an IC marking, "
-        "classify the chip as REAL (genuine), FAKE (counterfeit/clone), or UNCERTAIN. "
-        "Return a compact JSON with keys: status in [PASS, FAIL, WARNING] and reason (one short sentence)."
-    )
-    user_text = f"OCR text:\n{ocr_text.strip()}\n"
+GEMINI_REST_URL = "https://generativelanguage.googleapis.com/v1beta/models/{model}:generateContent?key={key}"
+GEMINI_STREAM_URL = "https://generativelanguage.googleapis.com/v1beta/models/{model}:streamGenerateContent?alt=sse&key={key}"
+# Keyword fallback for replies that aren't valid JSON (single scan each)
+_PASS = re.compile(r"\b(pass|real|genuine)\b", re.IGNORECASE)
+_FAIL = re.compile(r"\b(fail|fake|counterfeit)\b", re.IGNORECASE)
+# Early verdict detection while a streamed JSON reply is still arriving
+_STATUS_RE = re.compile(r'"status"\s*:\s*"(PASS|FAIL|WARNING)"', re.IGNORECASE)
+_JSON_HEADERS = {"Content-Type": "application/json"}
+CACHE_TTL_SECONDS = 3600
+# WARNING is often a transient "couldn't tell"; keep it only briefly so a retry can do better
+WARNING_CACHE_TTL_SECONDS = 60
+NEG_CACHE_TTL_SECONDS = 60
+_NEG_CACHE: dict[str, tuple[float, dict]] = {}
+_CACHE: dict[str, tuple[float, dict]] = {}
+# Prompt budget: OCR text is truncated and the reply is a one-line JSON verdict
+MAX_OCR_CHARS = 2000
+MAX_OUTPUT_TOKENS = 128
+SYSTEM_PROMPT = (
+    "IC authenticity auditor. Input JSON: ocr = OCR text of an IC marking (no other context). "
+    "Reply with JSON only: {\"status\": \"PASS|FAIL|WARNING\", \"reason\": one short sentence}. "
+    "PASS = genuine, FAIL = counterfeit/clone, WARNING = uncertain."
+)
+
+
+# Structured output with status first, so a streamed reply carries the verdict in its first tokens
+_RESPONSE_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "status": {"type": "STRING", "enum": ["PASS", "FAIL", "WARNING"]},
+        "reason": {"type": "STRING"},
+    },
+    "required": ["status", "reason"],
+    "propertyOrdering": ["status", "reason"],
+}
+
+
+def _user_text(ocr_text: str) -> str:
+    return orjson.dumps({"ocr": ocr_text.strip()[:MAX_OCR_CHARS]}).decode("utf-8")
+
+
+def _generation_config(model: str) -> dict:
+    config = {"temperature": 0.2, "responseMimeType": "application/json", "responseSchema": _RESPONSE_SCHEMA}
+    # 2.5 models spend "thinking" tokens from the same output budget; a tight cap can leave no answer
+    if not model.startswith("gemini-2.5"):
+        config["maxOutputTokens"] = MAX_OUTPUT_TOKENS
+    return config
+
+
+def _build_payload(ocr_text: str, model: str) -> dict:
     return {
-        "systemInstruction": {"role": "system", "parts": [{"text": system_instruction}]},
-        "contents": [{"role": "user", "parts": [{"text": user_text}]}],
-        "generationConfig": {"temperature": 0.2},
+        "systemInstruction": {"role": "system", "parts": [{"text": SYSTEM_PROMPT}]},
+        "contents": [{"role": "user", "parts": [{"text": _user_text(ocr_text)}]}],
+        "generationConfig": _generation_config(model),
     }
 
 
-def _call_gemini(api_key: str, model: str, payload: dict) -> dict:
-    url = f"https://generativelanguage.googleapis.com/v1beta/models/{model}:generateContent?key={api_key}"
-    resp = requests.post(url, json=payload, timeout=25)
-    if not resp.ok:
-        hint = ""
-        body = resp.text or ""
-        if resp.status_code == 401:
-            hint = "Unauthorized: check GEMINI_API_KEY"
-        elif resp.status_code == 404:
-            hint = "Model not found: set GEMINI_MODEL (e.g., gemini-1.5-flash or gemini-1.5-pro)"
-        elif resp.status_code == 429:
-            hint = "Rate limited: slow down or check quota"
-        elif resp.status_code == 400:
-            if "API key not valid" in body or "not valid for this API" in body:
-                hint = "API key not valid for Generative Language API: create a new key in Google AI Studio"
-            elif "unsupported location" in body.lower():
-                hint = "Model unsupported in region: try gemini-1.5-flash or enable billing/region"
-            elif "model" in body.lower():
-                hint = "Bad request: verify GEMINI_MODEL (e.g., gemini-1.5-flash or gemini-1.5-pro)"
-            else:
-                hint = "Bad request: verify payload and model name"
-        return {"error": f"HTTP {resp.status_code} {hint}".strip(), "text": body}
-
-    data = resp.json()
+def _parse_verdict(text_out: str) -> dict:
+    # Parse JSON block; fallback to keyword heuristic
+    try:
+        parsed = orjson.loads(text_out)
+        status = str(parsed.get("status", "WARNING")).upper()
+        reason = parsed.get("reason") or "No reason provided."
+        if status not in {"PASS", "FAIL", "WARNING"}:
+            status = "WARNING"
+        return {"status": status, "reason": reason}
+    except Exception:
+        status = "WARNING"
+        if _PASS.search(text_out):
+            status = "PASS"
+        elif _FAIL.search(text_out):
+            status = "FAIL"
+        return {"status": status, "reason": text_out.strip()[:300]}
+
+
+def _error_from_status(status_code: int, body: str) -> dict:
+    hint = ""
+    body = body or ""
+    if status_code == 401:
+        hint = "Unauthorized: check GEMINI_API_KEY"
+    elif status_code == 404:
+        hint = "Model not found: set GEMINI_MODEL (e.g., gemini-1.5-flash or gemini-1.5-pro)"
+    elif status_code == 429:
+        hint = "Rate limited: slow down or check quota"
+    elif status_code == 400:
+        if "API key not valid" in body or "not valid for this API" in body:
+            hint = "API key not valid for Generative Language API: create a new key in Google AI Studio"
+        elif "unsupported location" in body.lower():
+            hint = "Model unsupported in region: try gemini-1.5-flash or enable billing/region"
+        elif "model" in body.lower():
+            hint = "Bad request: verify GEMINI_MODEL (e.g., gemini-1.5-flash or gemini-1.5-pro)"
+        else:
+            hint = "Bad request: verify payload and model name"
+    return {"error": f"HTTP {status_code} {hint}".strip(), "text": body}
+
+
+def _result_from_data(data: dict) -> dict:
     # Safety block handling
     candidates = data.get("candidates") or []
     if candidates and str(candidates[0].get("finishReason", "")).upper() == "SAFETY":
@@ -54,22 +115,75 @@ def _call_gemini(api_key: str, model: str, payload: dict) -> dict:
     if not text_out:
         return {"error": "Empty response from Gemini"}
 
-    # Parse JSON block; fallback to keyword heuristic
+    return _parse_verdict(text_out)
+
+
+def _announce_status(text_out: str, on_status) -> bool:
+    """Report the status to `on_status` once it appears in the partial reply; True when done."""
+    m = _STATUS_RE.search(text_out)
+    if not m:
+        return False
     try:
-        parsed = json.loads(text_out)
-        status = str(parsed.get("status", "WARNING")).upper()
-        reason = parsed.get("reason") or "No reason provided."
-        if status not in {"PASS", "FAIL", "WARNING"}:
-            status = "WARNING"
-        return {"status": status, "reason": reason}
+        on_status(m.group(1).upper())
     except Exception:
-        low = text_out.lower()
-        status = "WARNING"
-        if any(k in low for k in ["pass", "real", "genuine"]):
-            status = "PASS"
-        elif any(k in low for k in ["fail", "fake", "counterfeit"]):
-            status = "FAIL"
-        return {"status": status, "reason": text_out.strip()[:300]}
+        # UI callbacks must never break classification
+        pass
+    return True
+
+
+def _is_complete(text_out: str) -> bool:
+    """True once a streamed reply is a complete JSON object, i.e. nothing useful is left to read."""
+    if not text_out.rstrip().endswith("}"):
+        return False
+    try:
+        orjson.loads(text_out)
+        return True
+    except orjson.JSONDecodeError:
+        return False
+
+
+def _call_gemini(api_key: str, model: str, payload: dict) -> dict:
+    url = GEMINI_REST_URL.format(model=model, key=api_key)
+    resp = get_session().post(url, data=orjson.dumps(payload), headers=_JSON_HEADERS, timeout=25)
+    if not resp.ok:
+        return _error_from_status(resp.status_code, resp.text)
+    return _result_from_data(orjson.loads(resp.content))
+
+
+async def _call_gemini_async(api_key: str, model: str, payload: dict, on_status=None, timeout: float = 25) -> dict:
+    """Streaming (SSE) call: `on_status` (if given) is called as soon as the status field arrives;
+    the stream is closed once the JSON verdict is complete and then parsed.
+    """
+    url = GEMINI_STREAM_URL.format(model=model, key=api_key)
+    text_out = ""
+    announced = False
+    try:
+        async with pooled_client() as client:
+            async with client.stream("POST", url, content=orjson.dumps(payload), headers=_JSON_HEADERS, timeout=timeout) as resp:
+                if not resp.is_success:
+                    body = (await resp.aread()).decode("utf-8", errors="replace")
+                    return _error_from_status(resp.status_code, body)
+                async for line in resp.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    chunk = orjson.loads(line[5:])
+                    candidates = chunk.get("candidates") or []
+                    if candidates and str(candidates[0].get("finishReason", "")).upper() == "SAFETY":
+                        return {"status": "WARNING", "reason": "Content blocked by safety filters"}
+                    if candidates:
+                        parts = candidates[0].get("content", {}).get("parts") or []
+                        text_out += "".join([p.get("text", "") for p in parts])
+                    if not announced and on_status is not None:
+                        announced = _announce_status(text_out, on_status)
+                    if _is_complete(text_out):
+                        # Verdict complete: close the stream rather than wait for the trailing chunks
+                        break
+    except Exception as e:
+        return {"error": f"Network/Client error: {e}"}
+
+    if not text_out:
+        return {"error": "Empty response from Gemini"}
+    return _parse_verdict(text_out)
 
 
 def _normalize_model(model: str) -> str:
@@ -80,6 +194,50 @@ def _normalize_model(model: str) -> str:
     return m
 
 
+def _sdk_prompt(ocr_text: str) -> str:
+    return f"{SYSTEM_PROMPT}\n\n{_user_text(ocr_text)}"
+
+
+def _sdk_config(model: str) -> dict:
+    config = _generation_config(model)
+    cfg = {
+        "temperature": config["temperature"],
+        "response_mime_type": "application/json",
+        "response_schema": {
+            "type": "OBJECT",
+            "properties": _RESPONSE_SCHEMA["properties"],
+            "required": _RESPONSE_SCHEMA["required"],
+            "property_ordering": _RESPONSE_SCHEMA["propertyOrdering"],
+        },
+    }
+    if "maxOutputTokens" in config:
+        cfg["max_output_tokens"] = config["maxOutputTokens"]
+    return cfg
+
+
+def _sdk_result(resp) -> dict:
+    text_out = getattr(resp, "text", None) or getattr(resp, "output_text", None) or ""
+    if not text_out:
+        # Try candidates shape if present
+        candidates = getattr(resp, "candidates", None) or []
+        if candidates:
+            parts = (candidates[0].get("content") or {}).get("parts") or []
+            text_out = "\n".join([p.get("text", "") for p in parts])
+    if not text_out:
+        return {"error": "Empty response from Gemini SDK"}
+    return _parse_verdict(text_out)
+
+
+def _sdk_error(e: Exception) -> dict:
+    msg = str(e)
+    # Provide model-specific hinting
+    if "unexpected model name format" in msg.lower() or "not found" in msg.lower():
+        return {"error": "HTTP 400 Bad request: verify GEMINI_MODEL (e.g., gemini-1.5-flash or gemini-1.5-pro)", "text": msg}
+    if "not valid for this api" in msg.lower():
+        return {"error": "API key not valid for Generative Language API: create a new key in Google AI Studio", "text": msg}
+    return {"error": f"SDK error: {e}", "text": msg}
+
+
 def _classify_with_sdk(model: str, ocr_text: str) -> dict | None:
     """Attempt classification via official google.genai SDK.
     Returns a result dict on success or an error dict on failure. If SDK is missing, returns None.
@@ -89,69 +247,119 @@ def _classify_with_sdk(model: str, ocr_text: str) -> dict | None:
     except Exception:
         return None
 
-    prompt = (
-        "You are an expert IC authenticity auditor. Given ONLY the OCR text from an IC marking, "
-        "classify the chip as REAL (genuine), FAKE (counterfeit/clone), or UNCERTAIN. "
-        "Return a compact JSON with keys: status in [PASS, FAIL, WARNING] and reason (one short sentence).\n\n"
-        f"OCR text:\n{ocr_text.strip()}\n"
-    )
-
     try:
         client = genai.Client()  # Reads GEMINI_API_KEY from environment
-        resp = client.models.generate_content(model=model, contents=prompt)
-        text_out = getattr(resp, "text", None) or getattr(resp, "output_text", None) or ""
-        if not text_out:
-            # Try candidates shape if present
-            candidates = getattr(resp, "candidates", None) or []
-            if candidates:
-                parts = (candidates[0].get("content") or {}).get("parts") or []
-                text_out = "\n".join([p.get("text", "") for p in parts])
+        resp = client.models.generate_content(model=model, contents=_sdk_prompt(ocr_text), config=_sdk_config(model))
+        return _sdk_result(resp)
+    except Exception as e:
+        return _sdk_error(e)
+
+
+async def _classify_with_sdk_async(model: str, ocr_text: str, on_status=None, timeout: float = 25) -> dict | None:
+    """Async variant of _classify_with_sdk using the SDK's `aio` client.
+    The reply is streamed: `on_status` (if given) gets the status as soon as it appears and
+    reading stops once the JSON verdict is complete.
+    """
+    try:
+        from google import genai
+    except Exception:
+        return None
+
+    try:
+        # Reads GEMINI_API_KEY from environment; the SDK takes its timeout in milliseconds
+        client = genai.Client(http_options={"timeout": int(timeout * 1000)})
+        text_out = ""
+        announced = False
+        stream = await client.aio.models.generate_content_stream(model=model, contents=_sdk_prompt(ocr_text), config=_sdk_config(model))
+        async for chunk in stream:
+            text_out += getattr(chunk, "text", None) or ""
+            if not announced and on_status is not None:
+                announced = _announce_status(text_out, on_status)
+            if _is_complete(text_out):
+                break
         if not text_out:
             return {"error": "Empty response from Gemini SDK"}
-
-        try:
-            parsed = json.loads(text_out)
-            status = str(parsed.get("status", "WARNING")).upper()
-            reason = parsed.get("reason") or "No reason provided."
-            if status not in {"PASS", "FAIL", "WARNING"}:
-                status = "WARNING"
-            return {"status": status, "reason": reason}
-        except Exception:
-            low = text_out.lower()
-            status = "WARNING"
-            if any(k in low for k in ["pass", "real", "genuine"]):
-                status = "PASS"
-            elif any(k in low for k in ["fail", "fake", "counterfeit"]):
-                status = "FAIL"
-            return {"status": status, "reason": text_out.strip()[:300]}
+        return _parse_verdict(text_out)
     except Exception as e:
-        msg = str(e)
-        # Provide model-specific hinting
-        if "unexpected model name format" in msg.lower() or "not found" in msg.lower():
-            return {"error": "HTTP 400 Bad request: verify GEMINI_MODEL (e.g., gemini-1.5-flash or gemini-1.5-pro)", "text": msg}
-        if "not valid for this api" in msg.lower():
-            return {"error": "API key not valid for Generative Language API: create a new key in Google AI Studio", "text": msg}
-        return {"error": f"SDK error: {e}", "text": msg}
+        return _sdk_error(e)
 
 
-def classify_genuineness(ocr_text: str) -> dict:
-    """Call Gemini API to classify IC genuineness using OCR text only.
-    Returns: {"status": "PASS|FAIL|WARNING", "reason": "..."} or {"error": "..."}.
-    Implements model fallback on common 400/404 model errors.
-    """
+def _is_model_error(res: dict) -> bool:
+    body = (res.get("text") or "").lower()
+    return ("model" in body) or ("not found" in body) or ("unsupported" in body) or ("unexpected model name format" in body)
+
+
+def _models() -> tuple[str, list[str]]:
+    primary = _normalize_model(os.getenv("GEMINI_MODEL") or "gemini-1.5-flash")
+    fallbacks = [m for m in ["gemini-1.5-flash", "gemini-1.5-pro"] if m != primary]
+    return primary, fallbacks
+
+
+def _cache_key(ocr_text: str) -> str:
+    # Normalize case/whitespace so OCR reruns of the same marking share a verdict
+    norm = " ".join(ocr_text.upper().split())
+    return hashlib.sha1(f"{_models()[0]}|{norm}".encode("utf-8")).hexdigest()
+
+
+def _cache_get(key: str) -> dict | None:
+    hit = _CACHE.get(key)
+    if hit and time.time() < hit[0]:
+        return dict(hit[1])
+    return None
+
+
+def _cache_put(key: str, res: dict) -> None:
+    # Only verdicts are cached; errors should be retried
+    if not res.get("error"):
+        ttl = WARNING_CACHE_TTL_SECONDS if str(res.get("status", "")).upper() == "WARNING" else CACHE_TTL_SECONDS
+        _CACHE[key] = (time.time() + ttl, dict(res))
+
+
+def _neg_key() -> str | None:
+    api_key = os.getenv("GEMINI_API_KEY")
+    if not api_key:
+        return None
+    # The model is part of the key: a 404 "model not found" is fixed by changing GEMINI_MODEL
+    return "gemini:" + hashlib.sha1(f"{api_key}|{_models()[0]}".encode("utf-8")).hexdigest()[:8]
+
+
+def _is_key_error(res: dict) -> bool:
+    err = res.get("error") or ""
+    return err.startswith(("HTTP 401", "HTTP 402", "HTTP 404")) or "API key not valid" in err
+
+
+def _neg_get() -> dict | None:
+    # Recent auth/billing/not-found failure for this key: fail fast instead of re-waiting on the API
+    key = _neg_key()
+    hit = _NEG_CACHE.get(key) if key else None
+    if hit and (time.time() - hit[0]) < NEG_CACHE_TTL_SECONDS:
+        return dict(hit[1])
+    return None
+
+
+def _neg_put(res: dict) -> None:
+    key = _neg_key()
+    if key and _is_key_error(res):
+        _NEG_CACHE[key] = (time.time(), dict(res))
+
+
+def clear_negative_cache() -> None:
+    """Forget cached key failures (e.g. after the user edits the API key)."""
+    _NEG_CACHE.clear()
+
+
+def _classify(ocr_text: str) -> dict:
     api_key = os.getenv("GEMINI_API_KEY")
     if not api_key:
         return {"error": "GEMINI_API_KEY missing"}
 
-    primary = _normalize_model(os.getenv("GEMINI_MODEL") or "gemini-1.5-flash")
-    fallbacks = [m for m in ["gemini-1.5-flash", "gemini-1.5-pro"] if m != primary]
+    primary, fallbacks = _models()
 
     # First, try SDK path if available
     sdk_res = _classify_with_sdk(primary, ocr_text)
     if isinstance(sdk_res, dict):
         if sdk_res.get("error"):
-            body = (sdk_res.get("text") or "").lower()
-            if ("model" in body) or ("not found" in body) or ("unsupported" in body) or ("unexpected model name format" in body):
+            if _is_model_error(sdk_res):
                 for alt in fallbacks:
                     sdk_res2 = _classify_with_sdk(alt, ocr_text)
                     if isinstance(sdk_res2, dict) and not sdk_res2.get("error"):
@@ -162,12 +370,11 @@ def classify_genuineness(ocr_text: str) -> dict:
             return sdk_res
 
     # REST path
-    payload = _build_payload(ocr_text)
+    payload = _build_payload(ocr_text, primary)
     res = _call_gemini(api_key, primary, payload)
     if res.get("error"):
-        body = (res.get("text") or "").lower()
         # Fallback on model-related errors (404 or 400 mentioning model)
-        if ("model" in body) or ("not found" in body) or ("unsupported" in body) or ("unexpected model name format" in body):
+        if _is_model_error(res):
             for alt in fallbacks:
                 res2 = _call_gemini(api_key, alt, payload)
                 if not res2.get("error"):
@@ -176,4 +383,198 @@ def classify_genuineness(ocr_text: str) -> dict:
             res["error"] += " (model fallback attempted)"
         return res
 
-    return res
\ No newline at end of file
+    return res
+
+
+async def _classify_async(ocr_text: str, on_status=None, timeout: float = 25) -> dict:
+    api_key = os.getenv("GEMINI_API_KEY")
+    if not api_key:
+        return {"error": "GEMINI_API_KEY missing"}
+
+    primary, fallbacks = _models()
+
+    sdk_res = await _classify_with_sdk_async(primary, ocr_text, on_status, timeout)
+    if isinstance(sdk_res, dict):
+        if sdk_res.get("error"):
+            if _is_model_error(sdk_res):
+                for alt in fallbacks:
+                    sdk_res2 = await _classify_with_sdk_async(alt, ocr_text, on_status, timeout)
+                    if isinstance(sdk_res2, dict) and not sdk_res2.get("error"):
+                        return sdk_res2
+                sdk_res["error"] += " (model fallback attempted)"
+        else:
+            return sdk_res
+
+    payload = _build_payload(ocr_text, primary)
+    res = await _call_gemini_async(api_key, primary, payload, on_status, timeout)
+    if res.get("error"):
+        if _is_model_error(res):
+            for alt in fallbacks:
+                res2 = await _call_gemini_async(api_key, alt, payload, on_status, timeout)
+                if not res2.get("error"):
+                    return res2
+            res["error"] += " (model fallback attempted)"
+        return res
+
+    return res
+
+
+def classify_genuineness(ocr_text: str) -> dict:
+    """Call Gemini API to classify IC genuineness using OCR text only.
+    Returns: {"status": "PASS|FAIL|WARNING", "reason": "..."} or {"error": "..."}.
+    Implements model fallback on common 400/404 model errors.
+    Verdicts are cached per normalized OCR text for CACHE_TTL_SECONDS (WARNING for WARNING_CACHE_TTL_SECONDS).
+    """
+    if not ocr_text.strip():
+        # Nothing to classify; skip the API round-trip
+        return {"status": "WARNING", "reason": "empty OCR"}
+    key = _cache_key(ocr_text)
+    hit = _cache_get(key)
+    if hit is not None:
+        return hit
+    neg = _neg_get()
+    if neg is not None:
+        return neg
+    res = _classify(ocr_text)
+    _cache_put(key, res)
+    _neg_put(res)
+    return res
+
+
+async def classify_genuineness_async(ocr_text: str, on_status=None, timeout: float = 25) -> dict:
+    """Async variant of classify_genuineness; same result shape, fallbacks and cache.
+    The reply is streamed; if `on_status` is given, `on_status("PASS"|"FAIL"|"WARNING")`
+    is called as soon as the status is readable, before the reason has finished generating.
+    `timeout` (seconds) applies to each API request.
+    """
+    if not ocr_text.strip():
+        # Nothing to classify; skip the API round-trip
+        return {"status": "WARNING", "reason": "empty OCR"}
+    key = _cache_key(ocr_text)
+    hit = _cache_get(key)
+    if hit is not None:
+        return hit
+    neg = _neg_get()
+    if neg is not None:
+        return neg
+    res = await _classify_async(ocr_text, on_status, timeout)
+    _cache_put(key, res)
+    _neg_put(res)
+    return res
+
+
+# --- Batch classification: one request for several OCR texts ---
+BATCH_SYSTEM_PROMPT = (
+    "IC authenticity auditor. Input JSON: items = [{idx, ocr}], ocr = OCR text of one IC marking (no other context). "
+    "Reply with a JSON array, one {\"idx\", \"status\": \"PASS|FAIL|WARNING\", \"reason\": one short sentence} per item. "
+    "PASS = genuine, FAIL = counterfeit/clone, WARNING = uncertain."
+)
+_BATCH_RESPONSE_SCHEMA = {
+    "type": "ARRAY",
+    "items": {
+        "type": "OBJECT",
+        "properties": {"idx": {"type": "INTEGER"}, **_RESPONSE_SCHEMA["properties"]},
+        "required": ["idx", "status", "reason"],
+        "propertyOrdering": ["idx", "status", "reason"],
+    },
+}
+
+
+def _build_batch_payload(ocr_texts: list[str], model: str) -> dict:
+    config = _generation_config(model)
+    config["responseSchema"] = _BATCH_RESPONSE_SCHEMA
+    if "maxOutputTokens" in config:
+        config["maxOutputTokens"] = MAX_OUTPUT_TOKENS * len(ocr_texts)
+    items = [{"idx": i, "ocr": t.strip()[:MAX_OCR_CHARS]} for i, t in enumerate(ocr_texts)]
+    return {
+        "systemInstruction": {"role": "system", "parts": [{"text": BATCH_SYSTEM_PROMPT}]},
+        "contents": [{"role": "user", "parts": [{"text": orjson.dumps({"items": items}).decode("utf-8")}]}],
+        "generationConfig": config,
+    }
+
+
+# Per-item error for texts the model left out of an otherwise valid batch reply
+BATCH_MISSING_ERROR = "Missing from Gemini batch reply"
+
+
+def _parse_batch(data: dict, n: int) -> list[dict]:
+    """Scatter a batch reply back to input positions; items the model skipped get an error."""
+    candidates = data.get("candidates") or []
+    if candidates and str(candidates[0].get("finishReason", "")).upper() == "SAFETY":
+        return [{"status": "WARNING", "reason": "Content blocked by safety filters"} for _ in range(n)]
+    parts = (candidates[0].get("content", {}).get("parts") or []) if candidates else []
+    text_out = "".join([p.get("text", "") for p in parts])
+    try:
+        parsed = orjson.loads(text_out)
+    except orjson.JSONDecodeError:
+        return [{"error": "Unparseable batch reply from Gemini", "text": text_out[:300]} for _ in range(n)]
+
+    out: list[dict | None] = [None] * n
+    for item in parsed if isinstance(parsed, list) else []:
+        idx = item.get("idx") if isinstance(item, dict) else None
+        if isinstance(idx, int) and 0 <= idx < n and out[idx] is None:
+            status = str(item.get("status", "WARNING")).upper()
+            if status not in {"PASS", "FAIL", "WARNING"}:
+                status = "WARNING"
+            out[idx] = {"status": status, "reason": item.get("reason") or "No reason provided."}
+    return [res or {"error": BATCH_MISSING_ERROR} for res in out]
+
+
+async def _call_gemini_batch_async(api_key: str, model: str, payload: dict, n: int, timeout: float) -> list[dict]:
+    url = GEMINI_REST_URL.format(model=model, key=api_key)
+    try:
+        async with pooled_client() as client:
+            resp = await client.post(url, content=orjson.dumps(payload), headers=_JSON_HEADERS, timeout=timeout)
+    except Exception as e:
+        return [{"error": f"Network/Client error: {e}"} for _ in range(n)]
+    if not resp.is_success:
+        err = _error_from_status(resp.status_code, resp.text)
+        return [dict(err) for _ in range(n)]
+    try:
+        data = orjson.loads(resp.content)
+    except orjson.JSONDecodeError as e:
+        return [{"error": f"Invalid JSON from Gemini: {e}"} for _ in range(n)]
+    return _parse_batch(data, n)
+
+
+async def classify_genuineness_batch_async(ocr_texts: list[str], timeout: float = 25) -> list[dict]:
+    """Classify several OCR texts with a single Gemini request (REST, JSON array output).
+    Returns one result dict per input, same shape as classify_genuineness. Cached verdicts are
+    reused and only the misses are sent; per-item errors are returned, not raised.
+    """
+    results: list[dict | None] = [None] * len(ocr_texts)
+    misses = []
+    for i, text in enumerate(ocr_texts):
+        if not text.strip():
+            results[i] = {"status": "WARNING", "reason": "empty OCR"}
+            continue
+        hit = _cache_get(_cache_key(text))
+        if hit is not None:
+            results[i] = hit
+        else:
+            misses.append(i)
+    if not misses:
+        return results
+
+    api_key = os.getenv("GEMINI_API_KEY")
+    neg = _neg_get()
+    if not api_key or neg is not None:
+        err = neg or {"error": "GEMINI_API_KEY missing"}
+        for i in misses:
+            results[i] = dict(err)
+        return results
+
+    primary, fallbacks = _models()
+    batch = [ocr_texts[i] for i in misses]
+    replies = await _call_gemini_batch_async(api_key, primary, _build_batch_payload(batch, primary), len(batch), timeout)
+    if replies and replies[0].get("error") and _is_model_error(replies[0]):
+        for alt in fallbacks:
+            alt_replies = await _call_gemini_batch_async(api_key, alt, _build_batch_payload(batch, alt), len(batch), timeout)
+            if not alt_replies[0].get("error"):
+                replies = alt_replies
+                break
+    _neg_put(replies[0])
+    for i, res in zip(misses, replies):
+        _cache_put(_cache_key(ocr_texts[i]), res)
+        results[i] = res
+    return results
@@ -0,0 +1,65 @@
+import asyncio
+import concurrent.futures
+import contextlib
+import threading
+from typing import AsyncIterator, Optional
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import streamlit as st
+
+
+@st.cache_resource(show_spinner=False)
+def get_session() -> requests.Session:
+    """Shared keep-alive session for the sync API clients.
+    Cached as a resource so pooled TCP/TLS connections survive Streamlit reruns.
+    """
+    session = requests.Session()
+    # Pools sized for concurrent Streamlit sessions; connection errors on idempotent requests
+    # (SerpAPI GETs) are retried quickly, POSTs are left to the callers
+    adapter = HTTPAdapter(pool_connections=16, pool_maxsize=32, max_retries=Retry(total=2, backoff_factor=0.1))
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+# Background event loop for the async clients: asyncio.run() would create (and tear down)
+# a loop per call, and an httpx.AsyncClient's pool can't outlive the loop it was used on
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+_async_client: Optional[httpx.AsyncClient] = None
+
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="aoi-io-loop", daemon=True).start()
+            _loop = loop
+    return _loop
+
+
+def run_async(coro) -> concurrent.futures.Future:
+    """Schedule `coro` on the shared background loop; returns a concurrent Future."""
+    return asyncio.run_coroutine_threadsafe(coro, _get_loop())
+
+
+@contextlib.asynccontextmanager
+async def pooled_client() -> AsyncIterator[httpx.AsyncClient]:
+    """Yield the shared keep-alive AsyncClient when running on the background loop
+    (see run_async); elsewhere (e.g. under asyncio.run) a one-off client is used and closed.
+    Pass per-request timeouts, the shared client has no default tuned for any API.
+    """
+    global _async_client
+    if asyncio.get_running_loop() is not _loop:
+        async with httpx.AsyncClient(timeout=25) as client:
+            yield client
+        return
+    if _async_client is None:
+        _async_client = httpx.AsyncClient(
+            timeout=25, limits=httpx.Limits(max_connections=32, max_keepalive_connections=16)
+        )
+    yield _async_client
@@ -1,7 +1,9 @@
 from typing import List
 import os
+import threading
 
 from PIL import Image
+import streamlit as st
 
 
 def _pil_to_np(img: Image.Image):
@@ -9,13 +11,39 @@ def _pil_to_np(img: Image.Image):
     return np.array(img)
 
 
+@st.cache_resource(show_spinner=False)
 def _load_easyocr_reader():
+    # Cached across reruns and sessions so torch weights load once per process.
     # Lazy import to keep app responsive; torch loads may be heavy.
     import easyocr
     # English and common Latin scripts; extend as needed
     return easyocr.Reader(["en"], gpu=False)
 
 
+_warmup_lock = threading.Lock()
+_warmup_started = False
+
+
+def _warm_easyocr() -> None:
+    try:
+        _load_easyocr_reader()
+    except Exception:
+        # Non-fatal; the first OCR call will surface the error
+        pass
+
+
+def warm_up_easyocr() -> None:
+    """Start loading the EasyOCR reader in a background thread, once per process.
+    Populates the st.cache_resource entry so the first OCR request doesn't pay the model load.
+    """
+    global _warmup_started
+    with _warmup_lock:
+        if _warmup_started:
+            return
+        _warmup_started = True
+    threading.Thread(target=_warm_easyocr, name="easyocr-warmup", daemon=True).start()
+
+
 def _tesseract_default_path() -> str:
     # Prefer Windows default if present; otherwise fall back to common Linux path
     if os.name == "nt":
@@ -23,21 +51,27 @@ def _tesseract_default_path() -> str:
     return "/usr/bin/tesseract"
 
 
-def _run_tesseract(img: Image.Image) -> str:
+@st.cache_resource(show_spinner=False)
+def _load_tesseract():
+    """Import pytesseract once; the executable path is set per call in _run_tesseract."""
     # Lazy import to avoid overhead when not selected
     try:
         import pytesseract
     except Exception as e:
         raise RuntimeError(f"pytesseract not available: {e}")
+    return pytesseract
+
 
-    # Configure executable path from env or sensible default
+def _run_tesseract(img: Image.Image) -> str:
+    pytesseract = _load_tesseract()
+    # Configure executable path from env or sensible default; set on every call since
+    # tesseract_cmd is module-global and the path can change between runs
     tess_cmd = os.getenv("TESSERACT_CMD") or _tesseract_default_path()
-    if tess_cmd:
-        try:
-            pytesseract.pytesseract.tesseract_cmd = tess_cmd
-        except Exception:
-            # Non-fatal; pytesseract may still find tesseract on PATH
-            pass
+    try:
+        pytesseract.pytesseract.tesseract_cmd = tess_cmd
+    except Exception:
+        # Non-fatal; pytesseract may still find tesseract on PATH
+        pass
 
     # Use a reasonable PSM for block of text; adjust if needed
     config = "--psm 6"
@@ -45,9 +79,6 @@ def _run_tesseract(img: Image.Image) -> str:
     return text.strip()
 
 
-_reader = None
-
-
 def extract_text(img: Image.Image, engine: str = "EasyOCR") -> str:
     """Extract text from preprocessed ROI using selected OCR engine.
     Supports EasyOCR and Tesseract (pytesseract).
@@ -63,13 +94,33 @@ def extract_text(img: Image.Image, engine: str = "EasyOCR") -> str:
             pass
 
     # EasyOCR path
-    global _reader
-    if _reader is None:
-        _reader = _load_easyocr_reader()
+    reader = _load_easyocr_reader()
 
     np_img = _pil_to_np(img)
-    # EasyOCR expects RGB NumPy arrays
-    results = _reader.readtext(np_img, detail=0)
+    # EasyOCR accepts grayscale or RGB NumPy arrays
+    results = reader.readtext(np_img, detail=0)
+    return _join_lines(results)
+
+
+def _join_lines(results: list) -> str:
     # Join lines into single text block
-    text = "\n".join([r.strip() for r in results if isinstance(r, str)])
-    return text
\ No newline at end of file
+    return "\n".join([r.strip() for r in results if isinstance(r, str)])
+
+
+def extract_text_batch(imgs: List[Image.Image], engine: str = "EasyOCR") -> List[str]:
+    """Extract text from several preprocessed variants of the same ROI.
+    EasyOCR runs all variants through one readtext_batched call (they must share a size);
+    Tesseract has no batch API, so each image goes through extract_text.
+    """
+    if str(engine).strip().lower() == "tesseract" or len(imgs) < 2:
+        return [extract_text(img, engine=engine) for img in imgs]
+
+    reader = _load_easyocr_reader()
+    batch = reader.readtext_batched([_pil_to_np(img) for img in imgs], detail=0)
+    return [_join_lines(results) for results in batch]
+
+
+def best_text(texts: List[str]) -> int:
+    """Index of the most informative OCR result (most alphanumeric characters)."""
+    scores = [sum(ch.isalnum() for ch in t) for t in texts]
+    return max(range(len(texts)), key=scores.__getitem__) if texts else -1
\ No newline at end of file
@@ -1,11 +1,23 @@
 import os
+import re
 import time
-import requests
-from urllib.parse import urlparse
+import orjson
+from utils.http import get_session, pooled_client
 
 
 GOOGLE_SERP_API = "https://serpapi.com/search"
 _CACHE: dict[str, tuple[float, dict]] = {}
+# Netloc of an http(s) URL (what urlparse(link).netloc returns for these links)
+_DOMAIN_RE = re.compile(r"^https?://([^/?#]+)", re.IGNORECASE)
+
+
+def _params(query: str, num: int, key: str) -> dict:
+    return {
+        "engine": "google",
+        "q": query,
+        "num": num,
+        "api_key": key,
+    }
 
 
 def google_search_marking(query: str, num: int = 5):
@@ -16,32 +28,65 @@ def google_search_marking(query: str, num: int = 5):
     if not key:
         return {"error": "SERPAPI_KEY missing"}
 
-    params = {
-        "engine": "google",
-        "q": query,
-        "num": num,
-        "api_key": key,
-    }
     try:
-        r = requests.get(GOOGLE_SERP_API, params=params, timeout=15)
+        r = get_session().get(GOOGLE_SERP_API, params=_params(query, num, key), timeout=15)
         if not r.ok:
             return {"error": f"HTTP {r.status_code}", "text": r.text}
-        return r.json()
+        return orjson.loads(r.content)
     except Exception as e:
         return {"error": str(e)}
 
 
+async def google_search_marking_async(query: str, num: int = 5, timeout: float = 15):
+    """Async variant of google_search_marking."""
+    key = os.getenv("SERPAPI_KEY")
+    if not key:
+        return {"error": "SERPAPI_KEY missing"}
+
+    try:
+        async with pooled_client() as client:
+            r = await client.get(GOOGLE_SERP_API, params=_params(query, num, key), timeout=timeout)
+        if not r.is_success:
+            return {"error": f"HTTP {r.status_code}", "text": r.text}
+        return orjson.loads(r.content)
+    except Exception as e:
+        return {"error": str(e)}
+
+
+def _cache_get(key: str, now: float, ttl_seconds: int):
+    hit = _CACHE.get(key)
+    if hit and (now - hit[0]) < ttl_seconds:
+        return hit[1]
+    return None
+
+
 def google_search_marking_cached(query: str, num: int = 5, ttl_seconds: int = 600):
     """Cached wrapper for SerpAPI Google Search to avoid duplicate costs.
     Uses a simple in-memory cache keyed by the query string for the session lifetime.
     """
     now = time.time()
     key = f"q={query}&n={num}"
-    hit = _CACHE.get(key)
-    if hit and (now - hit[0]) < ttl_seconds:
-        return hit[1]
+    hit = _cache_get(key, now, ttl_seconds)
+    if hit is not None:
+        return hit
     res = google_search_marking(query, num=num)
-    _CACHE[key] = (now, res)
+    # Errors (HTTP 5xx, timeouts, quota) are retried on the next call rather than cached
+    if not res.get("error"):
+        _CACHE[key] = (now, res)
+    return res
+
+
+async def google_search_marking_cached_async(query: str, num: int = 5, ttl_seconds: int = 600, timeout: float = 15):
+    """Async variant of google_search_marking_cached sharing the same cache."""
+    now = time.time()
+    key = f"q={query}&n={num}"
+    hit = _cache_get(key, now, ttl_seconds)
+    if hit is not None:
+        return hit
+    res = await google_search_marking_async(query, num=num, timeout=timeout)
+    # Errors (HTTP 5xx, timeouts, quota) are retried on the next call rather than cached
+    if not res.get("error"):
+        _CACHE[key] = (now, res)
     return res
 
 
@@ -50,8 +95,7 @@ def extract_domains(results: list) -> list:
     for r in results:
         link = r.get("link") or r.get("url")
         if link:
-            try:
-                domains.append(urlparse(link).netloc)
-            except Exception:
-                pass
-    return domains
\ No newline at end of file
+            m = _DOMAIN_RE.match(link)
+            if m:
+                domains.append(m.group(1))
+    return domains
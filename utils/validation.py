@@ -1,12 +1,22 @@
-from dataclasses import dataclass
-from typing import Optional
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+from typing import Callable, Optional
+import asyncio
+import hashlib
 import os
+import queue
 import re
-import requests
+import time
 from urllib.parse import urlparse
-from utils.search_client import google_search_marking_cached
-from utils.deepseek_client import classify_genuineness
-from utils.gemini_client import classify_genuineness as classify_genuineness_gemini
+import httpx
+import orjson
+from utils.disk_cache import disk_get, disk_put
+from utils.http import pooled_client, run_async
+from utils.search_client import google_search_marking_cached_async
+from utils.deepseek_client import classify_genuineness_async
+from utils.gemini_client import classify_genuineness_async as classify_genuineness_gemini_async
+from utils.gemini_client import classify_genuineness_batch_async as classify_genuineness_gemini_batch_async
+from utils.gemini_client import BATCH_MISSING_ERROR
 
 
 @dataclass
@@ -16,6 +26,44 @@ class ValidationResult:
     reference: Optional[str] = None
 
 
+# Per-provider request timeouts (seconds) and an overall cap for one validate_text call,
+# so a hung provider can't stall the OCR pipeline
+GEMINI_TIMEOUT_S = 15
+DEEPSEEK_TIMEOUT_S = 20
+SERPAPI_TIMEOUT_S = 8
+WEBHOOK_TIMEOUT_S = 10
+TOTAL_DEADLINE_S = 25
+# Slack kept before TOTAL_DEADLINE_S so a follow-up call times out (and its caller can still
+# answer with what it has) before the overall deadline discards everything
+DEADLINE_MARGIN_S = 0.25
+
+# Provider configuration is read from the environment once rather than on every validation;
+# call reload_env() after changing these variables (the app does so after its sidebar)
+_GEMINI_KEY: Optional[str] = None
+_DEEPSEEK_KEY: Optional[str] = None
+_SERPAPI_KEY: Optional[str] = None
+_N8N_URL: Optional[str] = None
+_GEMINI_MODEL = ""
+_DEEPSEEK_MODEL = ""
+_FAST_PATH_DISABLED = False
+
+
+def reload_env() -> None:
+    """Re-read provider keys and models, the n8n webhook URL and FAST_PATH_DISABLE from os.environ."""
+    global _GEMINI_KEY, _DEEPSEEK_KEY, _SERPAPI_KEY, _N8N_URL, _GEMINI_MODEL, _DEEPSEEK_MODEL, _FAST_PATH_DISABLED
+    _GEMINI_KEY = os.getenv("GEMINI_API_KEY")
+    _DEEPSEEK_KEY = os.getenv("DEEPSEEK_API_KEY")
+    # Same defaults as the clients; the models are part of the result-cache keys
+    _GEMINI_MODEL = (os.getenv("GEMINI_MODEL") or "gemini-1.5-flash").strip().removeprefix("models/")
+    _DEEPSEEK_MODEL = os.getenv("DEEPSEEK_MODEL") or "deepseek-reasoner"
+    _SERPAPI_KEY = os.getenv("SERPAPI_KEY")
+    _N8N_URL = os.getenv("N8N_WEBHOOK_URL")
+    _FAST_PATH_DISABLED = os.getenv("FAST_PATH_DISABLE", "").strip().lower() in ("1", "true", "yes")
+
+
+reload_env()
+
+
 KNOWN_MARKINGS = {
     # Demo references: part -> list of valid marking substrings
     "ATMEGA328P": ["MEGA328", "MEGA 328P", "ATMEGA328P"],
@@ -25,44 +73,198 @@ KNOWN_MARKINGS = {
 }
 
 
+def _build_marking_matcher() -> Callable[[str], set]:
+    """Return a function mapping upper-cased text to the set of (part, pattern) KNOWN_MARKINGS hits in it.
+    Uses a pyahocorasick automaton (one pass over the text) when installed, else `bytes.find`
+    per pattern on the ASCII-encoded text, which runs CPython's C substring search.
+    """
+    try:
+        import ahocorasick
+    except Exception:
+        ahocorasick = None
+
+    if ahocorasick is not None:
+        automaton = ahocorasick.Automaton()
+        for part, patterns in KNOWN_MARKINGS.items():
+            for p in patterns:
+                automaton.add_word(p.upper(), (part, p.upper()))
+        automaton.make_automaton()
+        return lambda t: {hit for _, hit in automaton.iter(t)} if t else set()
+
+    known_b = [(part, p.upper(), p.upper().encode("ascii", errors="replace"))
+               for part, patterns in KNOWN_MARKINGS.items() for p in patterns]
+
+    def match(t: str) -> set:
+        # Non-ASCII characters become "?" so they can't glue neighbouring characters together
+        tb = t.encode("ascii", errors="replace")
+        return {(part, p) for part, p, pb in known_b if tb.find(pb) >= 0}
+
+    return match
+
+
+_match_markings = _build_marking_matcher()
+
+
+def _matched_parts(text: str) -> list[str]:
+    """KNOWN_MARKINGS parts found in `text`, in KNOWN_MARKINGS order."""
+    seen = {part for part, _ in _match_markings(text.upper())}
+    return [part for part in KNOWN_MARKINGS if part in seen]
+
+
 def _local_validation(text: str) -> ValidationResult:
-    t = text.upper()
-    hits = []
-    for part, patterns in KNOWN_MARKINGS.items():
-        for p in patterns:
-            if p in t:
-                hits.append((part, p))
-                break
-
-    if not t.strip():
+    if not text.strip():
         return ValidationResult(status="WARNING", details="Empty OCR result.")
 
+    hits = _matched_parts(text)
     if hits:
-        parts = ", ".join([h[0] for h in hits])
+        parts = ", ".join(hits)
         return ValidationResult(status="PASS", details=f"Matched known parts: {parts}")
     else:
         return ValidationResult(status="WARNING", details="No local match; consider validating via web or n8n.")
 
 
-def validate_text(text: str, webhook_url: Optional[str] = None) -> ValidationResult:
-    """Validate OCR text either via n8n webhook or local/SerpAPI heuristics."""
-    webhook = webhook_url or os.getenv("N8N_WEBHOOK_URL")
-    if webhook:
-        try:
-            resp = requests.post(webhook, json={"ocr_text": text}, timeout=10)
-            if resp.ok:
-                data = resp.json() if "application/json" in resp.headers.get("Content-Type", "") else {}
-                status = (data.get("status") or "WARNING").upper()
-                details = data.get("details") or "Validated via n8n workflow."
-                reference = data.get("reference")
-                return ValidationResult(status=status, details=details, reference=reference)
-            else:
-                return ValidationResult(status="WARNING", details=f"n8n webhook error: {resp.status_code}")
-        except Exception as e:
-            return ValidationResult(status="WARNING", details=f"n8n webhook failed: {e}")
+# Full KNOWN_MARKINGS patterns trusted without web/LLM validation; short fragments such as
+# "7805" or "MEGA328" also match clones and stay with the LLM. Set FAST_PATH_DISABLE=1 to
+# force full validation (e.g. for audit runs)
+FAST_PATH_MARKINGS = {"ATMEGA328P", "LM7805", "NE555"}
+
+
+def _local_fast_path(text: str) -> Optional[ValidationResult]:
+    if _FAST_PATH_DISABLED:
+        return None
+    hits = _match_markings(text.upper())
+    parts = {part for part, _ in hits}
+    # Every matched part needs a trusted full marking, not just a fragment of one
+    if not parts or parts != {part for part, p in hits if p in FAST_PATH_MARKINGS}:
+        return None
+    names = ", ".join(part for part in KNOWN_MARKINGS if part in parts)
+    return ValidationResult(status="PASS", details=f"Matched known parts: {names}", reference="local-fastpath")
+
+
+# --- LLM result cache ---
+# OCR of the same chip is highly repetitive, so formatted LLM verdicts are reused in-process:
+# exact hits by canonical text, "semantic" hits by trigram Jaccard similarity over recent entries
+LLM_CACHE_MAXSIZE = 1024
+LLM_CACHE_TTL_S = 3600
+SEMANTIC_MIN_SIMILARITY = 0.92
+SEMANTIC_SCAN = 64
+# Uncertain (WARNING) verdicts expire after NEG_RESULT_TTL_S in both caches so a thin or
+# flaky provider answer isn't pinned; errors are never stored
+NEG_RESULT_TTL_S = 60
+# Entries: key -> (expires_at, provider, trigrams, result)
+_llm_cache: "OrderedDict[str, tuple[float, str, frozenset, ValidationResult]]" = OrderedDict()
+
+
+_NON_ALNUM_RE = re.compile(r"[^A-Z0-9]+")
+# Date codes (YYWW) and short lot/assembly codes (e.g. "20AU") vary between otherwise identical parts
+_DATE_CODE_RE = re.compile(r"\d{4}|[0-9]{2}[A-Z]{1,3}")
+# A complete part number: letters plus at least three digits ("LM7805", "74HC595"); a bare
+# prefix like "LM" or "74HC" is not, its digits are the next token ("74HC 4051")
+_PART_NUMBER_RE = re.compile(r"(?=[A-Z0-9]*[A-Z])(?=(?:[A-Z]*\d){3})[A-Z0-9]+")
+
+
+def _canonicalize(text: str) -> str:
+    """Cache-key form of OCR text: upper-case alphanumeric tokens, trailing date/lot codes
+    dropped when they follow a complete part number, sorted so multi-line label order doesn't matter.
+    """
+    tokens = _NON_ALNUM_RE.sub(" ", text.upper()).split()
+    end = len(tokens)
+    while end > 1 and _DATE_CODE_RE.fullmatch(tokens[end - 1]):
+        end -= 1
+    if end < len(tokens) and _PART_NUMBER_RE.fullmatch(tokens[end - 1]):
+        tokens = tokens[:end]
+    return " ".join(sorted(tokens))
 
-    # Fallback to local validation
-    return _local_validation(text)
+
+def _trigrams(norm: str) -> frozenset:
+    return frozenset(norm[i:i + 3] for i in range(max(1, len(norm) - 2)))
+
+
+def _llm_cache_key(provider: str, norm: str) -> str:
+    return hashlib.sha256(orjson.dumps({"provider": provider, "text": norm}, option=orjson.OPT_SORT_KEYS)).hexdigest()
+
+
+def _llm_cache_get(provider: str, text: str) -> Optional[ValidationResult]:
+    norm = _canonicalize(text)
+    now = time.time()
+    key = _llm_cache_key(provider, norm)
+    hit = _llm_cache.get(key)
+    if hit is not None:
+        if now < hit[0]:
+            _llm_cache.move_to_end(key)
+            return replace(hit[3])
+        del _llm_cache[key]
+
+    # Near-duplicate OCR (a misread character or two) among the most recent entries
+    grams = _trigrams(norm)
+    for i, (k, (expires_at, prov, other, result)) in enumerate(reversed(_llm_cache.items())):
+        if i >= SEMANTIC_SCAN:
+            break
+        if prov != provider or now >= expires_at:
+            continue
+        if len(grams & other) / len(grams | other) >= SEMANTIC_MIN_SIMILARITY:
+            _llm_cache.move_to_end(k)
+            return replace(result)
+    return None
+
+
+def _result_ttl(result: ValidationResult, ttl: int) -> int:
+    return ttl if result.status in ("PASS", "FAIL") else NEG_RESULT_TTL_S
+
+
+def _is_transient(result: ValidationResult) -> bool:
+    # A failed search leg can sit anywhere in the details (DeepSeek lists it under "Search results:")
+    details = result.details or ""
+    return "SerpAPI error:" in details or "LLM error encountered" in details
+
+
+def _llm_cache_put(provider: str, text: str, result: ValidationResult) -> None:
+    norm = _canonicalize(text)
+    key = _llm_cache_key(provider, norm)
+    expires_at = time.time() + _result_ttl(result, LLM_CACHE_TTL_S)
+    _llm_cache[key] = (expires_at, provider, _trigrams(norm), replace(result))
+    _llm_cache.move_to_end(key)
+    while len(_llm_cache) > LLM_CACHE_MAXSIZE:
+        _llm_cache.popitem(last=False)
+
+
+# Results also persist on disk (utils.disk_cache) so restarts don't re-pay SerpAPI/LLM calls;
+# bump PROMPT_VERSION whenever the prompts or result formatting change to invalidate them
+PROMPT_VERSION = "v1"
+DISK_CACHE_TTL_S = 7 * 86400
+
+
+def _cache_provider(provider: str, ctx: bool = False) -> str:
+    """Cache namespace for an LLM verdict: the provider plus its configured model, and whether
+    web search context went into it (a context-free verdict must not answer a search-backed lookup).
+    """
+    model = {"gemini": _GEMINI_MODEL, "deepseek": _DEEPSEEK_MODEL}[provider]
+    return f"{provider}:{model}:{'ctx' if ctx else 'noctx'}"
+
+
+def _input_hash(text: str) -> str:
+    return hashlib.sha256(_canonicalize(text).encode("utf-8")).hexdigest()
+
+
+# SQLite calls go through asyncio.to_thread: a slow disk or the cache lock would otherwise
+# stall every request in flight on the shared event loop
+async def _cached_llm_result(provider: str, text: str) -> Optional[ValidationResult]:
+    hit = _llm_cache_get(provider, text)
+    if hit is None:
+        hit = await asyncio.to_thread(disk_get, _input_hash(text), PROMPT_VERSION, provider)
+        if hit is not None:
+            _llm_cache_put(provider, text, hit)
+    return hit
+
+
+async def _store_result(provider: str, text: str, result: ValidationResult, memory: bool = True) -> None:
+    if _is_transient(result):
+        return
+    if memory:
+        _llm_cache_put(provider, text, result)
+    await asyncio.to_thread(
+        disk_put, _input_hash(text), PROMPT_VERSION, provider, result, expire=_result_ttl(result, DISK_CACHE_TTL_S)
+    )
 
 
 # --- SerpAPI-based validation ---
@@ -77,11 +279,48 @@ VENDOR_DOMAINS = {
     "renesas.com",
     "maximintegrated.com",
 }
+# Vendor domain or any of its subdomains (www.ti.com, ww1.microchip.com)
+_VENDOR_RE = re.compile(r"(?:^|\.)(?:" + "|".join(re.escape(v) for v in VENDOR_DOMAINS) + r")$")
+# Word-start match so plurals still count ("counterfeits") but e.g. "Cyclone" doesn't
+_BAD_RE = re.compile(r"\b(?:fake|counterfeit|clone)", re.IGNORECASE)
+
+
+def _score_serp_results(organic: list, vendor_re: re.Pattern, bad_re: re.Pattern
+                        ) -> tuple[Optional[dict], Optional[dict], list[str]]:
+    """Scan the top 5 search results in one pass; returns (pass_item, fail_item, details_lines).
+    pass_item is the first vendor-domain datasheet hit (`vendor_re` on the netloc), fail_item
+    the first result whose title/snippet matches `bad_re`.
+    """
+    top = organic[:5]
+    details_lines = [""] * len(top)
+    pass_item = None
+    fail_item = None
+    vendor_search = vendor_re.search
+    bad_search = bad_re.search
+    for i, item in enumerate(top):
+        get = item.get
+        title = get("title") or ""
+        link = get("link") or get("url") or ""
+        snippet = get("snippet") or ""
+        details_lines[i] = f"- {title} | {link}"
+        if pass_item is not None and fail_item is not None:
+            continue
+        dom = urlparse(link).netloc.lower() if link else ""
+        low = f"{title} {snippet}".lower()
+        if pass_item is None and dom and "datasheet" in low and vendor_search(dom) is not None:
+            pass_item = {"title": title, "link": link, "domain": dom}
+        if fail_item is None and bad_search(low) is not None:
+            fail_item = {"title": title, "link": link, "domain": dom, "snippet": snippet}
+    return pass_item, fail_item, details_lines
 
 
-def _validate_via_serpapi(text: str) -> ValidationResult:
+async def _validate_via_serpapi(text: str) -> ValidationResult:
+    cached = await asyncio.to_thread(disk_get, _input_hash(text), PROMPT_VERSION, "serpapi")
+    if cached is not None:
+        return cached
+
     q = f"{text} IC marking genuine datasheet"
-    res = google_search_marking_cached(q, num=5)
+    res = await google_search_marking_cached_async(q, num=5, timeout=SERPAPI_TIMEOUT_S)
     if isinstance(res, dict) and res.get("error"):
         return ValidationResult(status="WARNING", details=f"SerpAPI error: {res['error']}")
 
@@ -89,22 +328,7 @@ def _validate_via_serpapi(text: str) -> ValidationResult:
     if not organic:
         return ValidationResult(status="WARNING", details="No search results found.", reference="SerpAPI")
 
-    status = "WARNING"
-    details_lines = []
-    pass_item = None
-    fail_item = None
-    for item in organic[:5]:
-        title = item.get("title") or ""
-        link = item.get("link") or item.get("url") or ""
-        snippet = item.get("snippet") or ""
-        dom = urlparse(link).netloc if link else ""
-        details_lines.append(f"- {title} | {link}")
-        low = (title + " " + snippet).lower()
-        if not pass_item and "datasheet" in low and any(v in dom for v in VENDOR_DOMAINS):
-            pass_item = {"title": title, "link": link, "domain": dom}
-        if not fail_item and any(k in low for k in ["fake", "counterfeit", "clone"]):
-            fail_item = {"title": title, "link": link, "domain": dom, "snippet": snippet}
-
+    pass_item, fail_item, details_lines = _score_serp_results(organic, _VENDOR_RE, _BAD_RE)
     if pass_item:
         status = "PASS"
     elif fail_item:
@@ -132,41 +356,48 @@ def _validate_via_serpapi(text: str) -> ValidationResult:
     else:
         summary = "Summary: UNCERTAIN — no decisive signal in top results"
 
-    details = summary + "\n\nSearch results:\n" + "\n".join(details_lines) + "\n\nExplainer:\n" + "\n".join(explainer_lines)
-    return ValidationResult(status=status, details=details, reference="SerpAPI Google Search")
+    details = "\n".join([summary, "", "Search results:", *details_lines, "", "Explainer:", *explainer_lines])
+    result = ValidationResult(status=status, details=details, reference="SerpAPI Google Search")
+    await _store_result("serpapi", text, result, memory=False)
+    return result
 
 
-def _validate_via_deepseek(text: str) -> ValidationResult:
+async def _validate_via_deepseek(text: str, deadline: Optional[float] = None) -> ValidationResult:
     """Validate via DeepSeek LLM, optionally using SerpAPI results for context.
+    The search and a context-free DeepSeek call run concurrently; when the search is decisive and
+    the first verdict doesn't already agree with it, the LLM is asked again with the search results,
+    within what is left until `deadline` (event-loop time); otherwise the first verdict stands.
     Produces a brief summary and includes LLM Analysis, Search results, and Explainer when available.
     """
+    provider = _cache_provider("deepseek", ctx=bool(_SERPAPI_KEY))
+    cached = await _cached_llm_result(provider, text)
+    if cached is not None:
+        return cached
+
+    loop = asyncio.get_running_loop()
+    if deadline is None:
+        deadline = loop.time() + TOTAL_DEADLINE_S
     organic = None
+    reask_failed = False
     search_details_lines = []
     explainer_lines = []
     reference = "DeepSeek"
 
-    # If SerpAPI key is present, fetch web context for LLM and build explainer
-    if os.getenv("SERPAPI_KEY"):
+    # If SerpAPI key is present, fetch web context alongside the LLM call and build explainer
+    if not _SERPAPI_KEY:
+        llm = await classify_genuineness_async(text, timeout=DEEPSEEK_TIMEOUT_S)
+    else:
         q = f"{text} IC marking genuine datasheet"
-        res = google_search_marking_cached(q, num=5)
+        res, llm = await asyncio.gather(
+            google_search_marking_cached_async(q, num=5, timeout=SERPAPI_TIMEOUT_S),
+            classify_genuineness_async(text, timeout=DEEPSEEK_TIMEOUT_S),
+        )
         if isinstance(res, dict) and res.get("error"):
             search_details_lines.append(f"SerpAPI error: {res['error']}")
         else:
             organic = res.get("organic_results") or []
             reference = "DeepSeek + SerpAPI Google Search"
-            pass_item = None
-            fail_item = None
-            for item in organic[:5]:
-                title = item.get("title") or ""
-                link = item.get("link") or item.get("url") or ""
-                snippet = item.get("snippet") or ""
-                dom = urlparse(link).netloc if link else ""
-                search_details_lines.append(f"- {title} | {link}")
-                low = (title + " " + snippet).lower()
-                if not pass_item and "datasheet" in low and any(v in dom for v in VENDOR_DOMAINS):
-                    pass_item = {"title": title, "link": link, "domain": dom}
-                if not fail_item and any(k in low for k in ["fake", "counterfeit", "clone"]):
-                    fail_item = {"title": title, "link": link, "domain": dom, "snippet": snippet}
+            pass_item, fail_item, search_details_lines = _score_serp_results(organic, _VENDOR_RE, _BAD_RE)
 
             if pass_item:
                 explainer_lines.append(
@@ -179,41 +410,53 @@ def _validate_via_deepseek(text: str) -> ValidationResult:
             else:
                 explainer_lines.append("No decisive signal found in top results.")
 
-    # Call DeepSeek LLM to classify
-    llm = classify_genuineness(text, organic_results=organic)
-    if llm.get("error"):
-        details = "Summary: UNCERTAIN — LLM error encountered\n\nLLM Analysis:\n" + llm.get("error")
-        # Include search details if any
-        if search_details_lines:
-            details += "\n\nSearch results:\n" + "\n".join(search_details_lines)
-        if explainer_lines:
-            details += "\n\nExplainer:\n" + "\n".join(explainer_lines)
-        return ValidationResult(status="WARNING", details=details, reference=reference)
-
-    llm_status = (llm.get("status") or "WARNING").upper()
-    llm_reason = llm.get("reason") or "No reason provided."
+            # Decisive search the context-free verdict doesn't already agree with (uncertain or
+            # contradicting): ask again with the results
+            search_status = "PASS" if pass_item else "FAIL" if fail_item else None
+            if search_status and not llm.get("error") and (llm.get("status") or "WARNING").upper() != search_status:
+                remaining = deadline - DEADLINE_MARGIN_S - loop.time()
+                try:
+                    if remaining <= 0:
+                        raise asyncio.TimeoutError
+                    llm = await asyncio.wait_for(
+                        classify_genuineness_async(text, organic_results=organic, timeout=DEEPSEEK_TIMEOUT_S),
+                        timeout=remaining,
+                    )
+                except asyncio.TimeoutError:
+                    reask_failed = True
+                    explainer_lines.append("No time left to re-ask DeepSeek with these results; showing its first verdict.")
 
-    # Build summary from LLM decision
-    if llm_status == "PASS":
-        summary = f"Summary: REAL — {llm_reason}"
-    elif llm_status == "FAIL":
-        summary = f"Summary: FAKE — {llm_reason}"
+    if llm.get("error"):
+        llm_status = "WARNING"
+        details_parts = ["Summary: UNCERTAIN — LLM error encountered", "", "LLM Analysis:", llm["error"]]
     else:
-        summary = f"Summary: UNCERTAIN — {llm_reason}"
+        llm_status = (llm.get("status") or "WARNING").upper()
+        llm_reason = llm.get("reason") or "No reason provided."
+
+        # Build summary from LLM decision
+        if llm_status == "PASS":
+            summary = f"Summary: REAL — {llm_reason}"
+        elif llm_status == "FAIL":
+            summary = f"Summary: FAKE — {llm_reason}"
+        else:
+            summary = f"Summary: UNCERTAIN — {llm_reason}"
+        details_parts = [summary, "", "LLM Analysis:", f"Status: {llm_status}", f"Reason: {llm_reason}"]
 
-    details_parts = [summary, "", "LLM Analysis:", f"Status: {llm_status}", f"Reason: {llm_reason}"]
+    # Include search details if any; one join over the flat list of lines
     if search_details_lines:
         details_parts += ["", "Search results:", *search_details_lines]
     if explainer_lines:
         details_parts += ["", "Explainer:", *explainer_lines]
 
-    details = "\n".join(details_parts)
-    return ValidationResult(status=llm_status, details=details, reference=reference)
+    result = ValidationResult(status=llm_status, details="\n".join(details_parts), reference=reference)
+    # A verdict the search disagreed with but couldn't be re-checked is not worth keeping
+    if not llm.get("error") and not reask_failed:
+        await _store_result(provider, text, result)
+    return result
 
 
-def _validate_via_gemini(text: str) -> ValidationResult:
-    """Validate via Gemini LLM using OCR text only (no web context)."""
-    llm = classify_genuineness_gemini(text)
+def _result_from_llm(llm: dict, reference: str) -> ValidationResult:
+    """Format an LLM-only verdict (no web context) as a ValidationResult."""
     if llm.get("error"):
         details_lines = [
             "Summary: UNCERTAIN — LLM error encountered",
@@ -225,7 +468,7 @@ def _validate_via_gemini(text: str) -> ValidationResult:
         if body:
             details_lines += ["", "Response Body:", body]
         details = "\n".join(details_lines)
-        return ValidationResult(status="WARNING", details=details, reference="Gemini")
+        return ValidationResult(status="WARNING", details=details, reference=reference)
 
     llm_status = (llm.get("status") or "WARNING").upper()
     llm_reason = llm.get("reason") or "No reason provided."
@@ -238,38 +481,253 @@ def _validate_via_gemini(text: str) -> ValidationResult:
         summary = f"Summary: UNCERTAIN — {llm_reason}"
 
     details = "\n".join([summary, "", "LLM Analysis:", f"Status: {llm_status}", f"Reason: {llm_reason}"])
-    return ValidationResult(status=llm_status, details=details, reference="Gemini")
+    return ValidationResult(status=llm_status, details=details, reference=reference)
 
 
-def validate_text(text: str, webhook_url: Optional[str] = None, mode: Optional[str] = None) -> ValidationResult:
-    """Prefer Gemini-only validation; fall back to webhook or local heuristics.
-    If Gemini key is set, do NOT use SerpAPI or DeepSeek.
+async def _validate_via_gemini(text: str, on_status: Optional[Callable[[str], None]] = None) -> ValidationResult:
+    """Validate via Gemini LLM using OCR text only (no web context).
+    `on_status` receives the verdict early while the reply is still streaming.
+    """
+    cached = await _cached_llm_result(_cache_provider("gemini"), text)
+    if cached is not None:
+        return cached
+    llm = await classify_genuineness_gemini_async(text, on_status=on_status, timeout=GEMINI_TIMEOUT_S)
+    result = _result_from_llm(llm, reference="Gemini")
+    if not llm.get("error"):
+        await _store_result(_cache_provider("gemini"), text, result)
+    return result
+
+
+async def _race_llms(text: str) -> tuple[str, dict]:
+    """Ask Gemini and DeepSeek concurrently; the first verdict without an error wins and
+    the other request is cancelled. Returns (provider, result); if both fail, provider is
+    empty and the result carries both errors.
     """
+    tasks = {
+        asyncio.create_task(classify_genuineness_gemini_async(text, timeout=GEMINI_TIMEOUT_S)): "Gemini",
+        asyncio.create_task(classify_genuineness_async(text, timeout=DEEPSEEK_TIMEOUT_S)): "DeepSeek",
+    }
+    pending = set(tasks)
+    errors = []
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                try:
+                    res = task.result()
+                except Exception as e:
+                    res = {"error": f"Network/Client error: {e}"}
+                if not res.get("error"):
+                    return tasks[task], res
+                errors.append(f"{tasks[task]}: {res['error']}")
+    finally:
+        for task in pending:
+            task.cancel()
+    return "", {"error": "; ".join(errors)}
+
+
+async def _first_decisive(tasks: list[asyncio.Task]) -> ValidationResult:
+    """Wait for validator tasks concurrently and return the first PASS/FAIL, cancelling the
+    rest. If none is decisive, the first task (in list order) that didn't raise wins.
+    """
+    pending = set(tasks)
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None and task.result().status in ("PASS", "FAIL"):
+                    return task.result()
+    finally:
+        for task in pending:
+            task.cancel()
+    for task in tasks:
+        if task.exception() is None:
+            return task.result()
+    return ValidationResult(status="WARNING", details=f"Validation failed: {tasks[0].exception()}")
+
+
+async def _validate_via_llm_race(text: str) -> ValidationResult:
+    """Validate via whichever of Gemini/DeepSeek answers first (OCR text only).
+    A cached context-free verdict from either provider skips the race; the winner's verdict is
+    cached under its provider and model.
+    """
+    for provider in ("gemini", "deepseek"):
+        cached = await _cached_llm_result(_cache_provider(provider), text)
+        if cached is not None:
+            return cached
+    provider, llm = await _race_llms(text)
+    result = _result_from_llm(llm, reference=provider or "Gemini + DeepSeek")
+    if not llm.get("error"):
+        await _store_result(_cache_provider(provider.lower()), text, result)
+    return result
+
+
+# Transient gateway errors from the n8n host are retried after 0.1 / 0.2 / 0.4 s
+WEBHOOK_RETRIES = 3
+WEBHOOK_BACKOFF_S = 0.1
+WEBHOOK_RETRY_STATUSES = {502, 503, 504}
+_JSON_HEADERS = {"Content-Type": "application/json"}
+
+
+async def _post_webhook(client: httpx.AsyncClient, webhook: str, text: str) -> httpx.Response:
+    for attempt in range(WEBHOOK_RETRIES + 1):
+        last = attempt == WEBHOOK_RETRIES
+        try:
+            resp = await client.post(webhook, content=orjson.dumps({"ocr_text": text}), headers=_JSON_HEADERS,
+                                     timeout=WEBHOOK_TIMEOUT_S)
+        except (httpx.ConnectError, httpx.ConnectTimeout):
+            # Refused or timed out before connecting: nothing was sent yet, so retrying the POST is safe
+            if last:
+                raise
+        else:
+            if last or resp.status_code not in WEBHOOK_RETRY_STATUSES:
+                return resp
+        await asyncio.sleep(WEBHOOK_BACKOFF_S * (2 ** attempt))
+
+
+async def _validate_via_webhook(text: str, webhook: str) -> ValidationResult:
+    try:
+        async with pooled_client() as client:
+            resp = await _post_webhook(client, webhook, text)
+        if resp.is_success:
+            ct = resp.headers.get("Content-Type") or ""
+            data = orjson.loads(resp.content) if ct.startswith("application/json") else {}
+            status = (data.get("status") or "WARNING").upper()
+            details = data.get("details") or "Validated via n8n workflow."
+            reference = data.get("reference")
+            return ValidationResult(status=status, details=details, reference=reference)
+        else:
+            return ValidationResult(status="WARNING", details=f"n8n webhook error: {resp.status_code}")
+    except Exception as e:
+        return ValidationResult(status="WARNING", details=f"n8n webhook failed: {e}")
+
+
+async def _dispatch(text: str, webhook_url: Optional[str],
+                    on_status: Optional[Callable[[str], None]], deadline: float) -> ValidationResult:
+    # Unambiguous known markings don't need a web/LLM round-trip
+    fast = _local_fast_path(text)
+    if fast is not None:
+        return fast
+
+    # Race both LLMs when both keys are present
+    if _GEMINI_KEY and _DEEPSEEK_KEY:
+        return await _validate_via_llm_race(text)
+
+    # Gemini and SerpAPI heuristics concurrently; first PASS/FAIL wins
+    if _GEMINI_KEY and _SERPAPI_KEY:
+        return await _first_decisive([
+            asyncio.create_task(_validate_via_gemini(text, on_status=on_status)),
+            asyncio.create_task(_validate_via_serpapi(text)),
+        ])
+
     # Gemini-only path when key present
-    if os.getenv("GEMINI_API_KEY"):
-        return _validate_via_gemini(text)
+    if _GEMINI_KEY:
+        return await _validate_via_gemini(text, on_status=on_status)
 
     # Optional alternate web validations when Gemini missing
-    if os.getenv("DEEPSEEK_API_KEY"):
-        return _validate_via_deepseek(text)
-    if os.getenv("SERPAPI_KEY"):
-        return _validate_via_serpapi(text)
+    if _DEEPSEEK_KEY:
+        return await _validate_via_deepseek(text, deadline=deadline)
+    if _SERPAPI_KEY:
+        return await _validate_via_serpapi(text)
 
     # Fallbacks when web validation not available
-    webhook = webhook_url or os.getenv("N8N_WEBHOOK_URL")
+    webhook = webhook_url or _N8N_URL
     if webhook:
-        try:
-            resp = requests.post(webhook, json={"ocr_text": text}, timeout=10)
-            if resp.ok:
-                data = resp.json() if "application/json" in resp.headers.get("Content-Type", "") else {}
-                status = (data.get("status") or "WARNING").upper()
-                details = data.get("details") or "Validated via n8n workflow."
-                reference = data.get("reference")
-                return ValidationResult(status=status, details=details, reference=reference)
-            else:
-                return ValidationResult(status="WARNING", details=f"n8n webhook error: {resp.status_code}")
-        except Exception as e:
-            return ValidationResult(status="WARNING", details=f"n8n webhook failed: {e}")
+        return await _validate_via_webhook(text, webhook)
 
     # Final fallback to local heuristics
-    return _local_validation(text)
\ No newline at end of file
+    return _local_validation(text)
+
+
+async def validate_text_async(text: str, webhook_url: Optional[str] = None, mode: Optional[str] = None,
+                              on_status: Optional[Callable[[str], None]] = None) -> ValidationResult:
+    """Prefer LLM validation; fall back to webhook or local heuristics.
+    With both Gemini and DeepSeek keys set, both are asked concurrently and the first
+    verdict wins. With Gemini and SerpAPI keys, the first decisive (PASS/FAIL) of Gemini and
+    the SerpAPI heuristics wins; with only a Gemini key, Gemini is used alone.
+    `on_status` is called with a preliminary status when the provider streams one (Gemini).
+    Gives up with a WARNING after TOTAL_DEADLINE_S.
+    """
+    try:
+        deadline = asyncio.get_running_loop().time() + TOTAL_DEADLINE_S
+        return await asyncio.wait_for(_dispatch(text, webhook_url, on_status, deadline), timeout=TOTAL_DEADLINE_S)
+    except asyncio.TimeoutError:
+        return ValidationResult(status="WARNING", details="Validation deadline exceeded")
+
+
+# Concurrent per-text validations (SerpAPI/DeepSeek/webhook) in a batch
+BATCH_CONCURRENCY = 5
+
+
+async def validate_texts_async(texts: list[str], webhook_url: Optional[str] = None,
+                               mode: Optional[str] = None) -> list[ValidationResult]:
+    """Validate several OCR texts; results keep the input order.
+    Local fast-path and cached hits are resolved first. With a Gemini key, the remaining
+    texts go to Gemini in one batched request; anything left (no Gemini key, or items missing
+    from the batch reply) is validated individually, at most BATCH_CONCURRENCY at a time.
+    """
+    results: list[Optional[ValidationResult]] = [None] * len(texts)
+    remaining = []
+    for i, text in enumerate(texts):
+        if not text.strip():
+            results[i] = _local_validation(text)
+            continue
+        results[i] = _local_fast_path(text)
+        if results[i] is None:
+            remaining.append(i)
+
+    if remaining and _GEMINI_KEY:
+        provider = _cache_provider("gemini")
+        hits = await asyncio.gather(*(_cached_llm_result(provider, texts[i]) for i in remaining))
+        misses = []
+        for i, hit in zip(remaining, hits):
+            results[i] = hit
+            if hit is None:
+                misses.append(i)
+        llms = await classify_genuineness_gemini_batch_async([texts[i] for i in misses], timeout=GEMINI_TIMEOUT_S)
+        for i, llm in zip(misses, llms):
+            # Only items the model skipped are retried one by one; a failed request (quota,
+            # network, bad key) would just fail again per item, so it is reported as is
+            if llm.get("error") != BATCH_MISSING_ERROR:
+                results[i] = _result_from_llm(llm, reference="Gemini")
+                if not llm.get("error"):
+                    await _store_result(provider, texts[i], results[i])
+        remaining = [i for i in remaining if results[i] is None]
+
+    sem = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def _one(i: int) -> ValidationResult:
+        async with sem:
+            return await validate_text_async(texts[i], webhook_url=webhook_url, mode=mode)
+
+    # One failing text must not discard the others' results
+    outcomes = await asyncio.gather(*(_one(i) for i in remaining), return_exceptions=True)
+    for i, res in zip(remaining, outcomes):
+        if isinstance(res, Exception):
+            res = ValidationResult(status="WARNING", details=f"Validation failed: {res}")
+        results[i] = res
+    return results
+
+
+def validate_texts(texts: list[str], webhook_url: Optional[str] = None,
+                   mode: Optional[str] = None) -> list[ValidationResult]:
+    """Synchronous entry point for validate_texts_async."""
+    return run_async(validate_texts_async(texts, webhook_url=webhook_url, mode=mode)).result()
+
+
+def validate_text(text: str, webhook_url: Optional[str] = None, mode: Optional[str] = None,
+                  on_status: Optional[Callable[[str], None]] = None) -> ValidationResult:
+    """Synchronous entry point for validate_text_async (e.g. from the Streamlit script thread).
+    Runs on the shared background loop so pooled connections are reused across calls;
+    `on_status` is still invoked on the calling thread, where Streamlit elements can be written.
+    """
+    if on_status is None:
+        return run_async(validate_text_async(text, webhook_url=webhook_url, mode=mode)).result()
+    statuses: queue.SimpleQueue = queue.SimpleQueue()
+    fut = run_async(validate_text_async(text, webhook_url=webhook_url, mode=mode, on_status=statuses.put))
+    while not fut.done():
+        try:
+            on_status(statuses.get(timeout=0.05))
+        except queue.Empty:
+            pass
+    return fut.result()